@@ -0,0 +1,243 @@
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Callable, Dict, List
+
+from run_benchmarks import prepare_corpus
+
+from parse_debates import DebateParser, RunCheckpoint, speaker_table_to_dict
+from debate_sources import DirectorySource
+from speech_parsers import compare_backends
+from word_buckets import BucketStore
+
+# Wide enough to take in every sitting day of any synthetic corpus
+START_DATE = '1900-01-01'
+END_DATE = '2100-12-31'
+
+# A debate file with the markup the synthetic corpus does not produce: comments, CDATA, character
+# and predefined entities, processing instructions, tail text, empty speeches and missing attributes
+EDGE_CASE_DEBATE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<publicwhip scrapeversion="a" latest="yes">
+<major-heading id="h1">Heading &amp; more</major-heading>
+<speech id="s1" speakername="Jane Smith" person_id="uk.org.publicwhip/person/1">
+<p pid="1">It is &#8220;vital&#8221; that we &amp; our friends <i>support</i> this<!-- an editorial comment -->, said the <b>hon.</b> Member.</p>
+<p pid="2"><![CDATA[Text in a <CDATA> section]]> followed by tail text</p>
+<table><tr><td>Row one</td><td>&#163;100 &lt; &#xA3;200</td></tr></table>
+</speech>
+<speech id="s2" speakername="Sir John O&apos;Brien"><p>No person id, but caf&#233; &amp; cr&#232;me</p>tail after a paragraph</speech>
+<speech id="s3" person_id="uk.org.publicwhip/person/3"><p>No speaker name</p></speech>
+<speech id="s4" speakername="Empty Speech" person_id="uk.org.publicwhip/person/4"/>
+<?pi something?>
+<speech id="s5" speakername="Ms Mixed" person_id="uk.org.publicwhip/person/5">  Leading text <p>inner</p>  trailing  <p>  spaced   out  </p></speech>
+</publicwhip>
+'''
+
+def copy_mirror(corpus: str, work_dir: str) -> str:
+    """Copy the corpus's debate files, so a check can change them without touching the corpus."""
+    mirror = os.path.join(work_dir, 'scrapedxml')
+    shutil.copytree(os.path.join(corpus, 'scrapedxml'), mirror)
+    return mirror
+
+def bucket_store_contents(store_dir: str) -> Dict:
+    """Every bucket as {speaker: (speeches, {word: count})}, independent of word and speaker order."""
+    store = BucketStore(store_dir)
+    words = store.words
+    contents = {}
+    for key in store.keys:
+        speeches = store.speech_counts(key)
+        bucket = {store.speakers[speaker_index][0]: (speeches[speaker_index], {})
+                  for speaker_index in range(len(store.speakers)) if speeches[speaker_index]}
+        for speaker_index, word_ids, counts in store.iter_bucket(key):
+            name = store.speakers[speaker_index][0]
+            bucket[name] = (speeches[speaker_index], {words[word_id]: count for word_id, count in zip(word_ids, counts)})
+        contents[key] = bucket
+    return contents
+
+def compare(label: str, expected: Dict, actual: Dict) -> List[str]:
+    """Describe the keys whose values differ between two dicts."""
+    problems = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            problems.append(f"{label} {key} differs from a full rebuild")
+    return problems
+
+def run_incremental(mirror: str, output_file: str) -> DebateParser:
+    """Update output_file from the mirror with an --incremental --bucket-by day run."""
+    parser = DebateParser(source=DirectorySource(mirror), bucket_by='day')
+    manifest = parser.analyse_date_range_incrementally(START_DATE, END_DATE, output_file)
+    parser.save_results(output_file)
+    parser.save_buckets(parser.bucket_store_path(output_file))
+    manifest.save()
+    return parser
+
+def compare_with_rebuild(mirror: str, work_dir: str, incremental: DebateParser, output_file: str) -> List[str]:
+    """Compare an incremental run's totals and buckets with a full rebuild of the mirror."""
+    rebuilt = DebateParser(source=DirectorySource(mirror), bucket_by='day')
+    rebuilt.analyse_date_range(START_DATE, END_DATE)
+    rebuilt_store = os.path.join(work_dir, 'rebuilt.buckets')
+    rebuilt.save_buckets(rebuilt_store)
+
+    return (compare('speaker', speaker_table_to_dict(rebuilt.speakers, rebuilt.vocab),
+                    speaker_table_to_dict(incremental.speakers, incremental.vocab)) +
+            compare('bucket', bucket_store_contents(rebuilt_store),
+                    bucket_store_contents(incremental.bucket_store_path(output_file))))
+
+def debate_file_paths(mirror: str) -> List[str]:
+    debates_dir = os.path.join(mirror, 'debates')
+    return [os.path.join(debates_dir, filename) for filename in sorted(os.listdir(debates_dir))]
+
+def check_incremental_buckets(corpus: str, work_dir: str) -> List[str]:
+    """An incremental run after a debate file changes matches a full rebuild."""
+    mirror = copy_mirror(corpus, work_dir)
+    output_file = os.path.join(work_dir, 'incremental.json')
+    run_incremental(mirror, output_file)
+    # Take the first speech out of one sitting day's debates, which also has a Westminster Hall file
+    changed_file = debate_file_paths(mirror)[1]
+    with open(changed_file, 'rb') as f:
+        content = f.read()
+    with open(changed_file, 'wb') as f:
+        f.write(re.sub(rb'<speech .*?</speech>\n?', b'', content, count=1, flags=re.S))
+    return compare_with_rebuild(mirror, work_dir, run_incremental(mirror, output_file), output_file)
+
+def check_incremental_removed(corpus: str, work_dir: str) -> List[str]:
+    """An incremental run after debate files are withdrawn upstream matches a full rebuild."""
+    mirror = copy_mirror(corpus, work_dir)
+    output_file = os.path.join(work_dir, 'incremental.json')
+    run_incremental(mirror, output_file)
+    # One day loses its debates file, and the next loses both of its files
+    first, second = debate_file_paths(mirror)[2:4]
+    os.remove(first)
+    os.remove(second)
+    for filename in os.listdir(os.path.join(mirror, 'westminhall')):
+        if os.path.basename(second)[len('debates'):] == filename[len('westminster'):]:
+            os.remove(os.path.join(mirror, 'westminhall', filename))
+    return compare_with_rebuild(mirror, work_dir, run_incremental(mirror, output_file), output_file)
+
+def check_incremental_failed_listing(corpus: str, work_dir: str) -> List[str]:
+    """An incremental run that cannot list one debate directory keeps the files counted from it before."""
+    mirror = copy_mirror(corpus, work_dir)
+    output_file = os.path.join(work_dir, 'incremental.json')
+    run_incremental(mirror, output_file)
+    # Listing Westminster Hall fails, as if its index could not be fetched
+    westminhall = os.path.join(mirror, 'westminhall')
+    os.rename(westminhall, westminhall + '.unavailable')
+    incremental = run_incremental(mirror, output_file)
+    os.rename(westminhall + '.unavailable', westminhall)
+    return compare_with_rebuild(mirror, work_dir, incremental, output_file)
+
+def check_incremental_missing_output(corpus: str, work_dir: str) -> List[str]:
+    """An incremental run whose output file was deleted rebuilds it in full."""
+    mirror = copy_mirror(corpus, work_dir)
+    output_file = os.path.join(work_dir, 'incremental.json')
+    run_incremental(mirror, output_file)
+    os.remove(output_file)
+    return compare_with_rebuild(mirror, work_dir, run_incremental(mirror, output_file), output_file)
+
+def analyse_with_phrases(mirror: str, checkpoint: RunCheckpoint = None, resume: bool = False, workers: int = 1,
+                         stop_after: int = None) -> DebateParser:
+    """Analyse the mirror counting phrases in small summaries, so they fill up and evict phrases.
+
+    With stop_after, the run is interrupted as if by Ctrl-C once that many files have been counted.
+    """
+    parser = DebateParser(source=DirectorySource(mirror), workers=workers, phrase_capacity=50, phrase_top=50)
+    if stop_after:
+        file_completed = parser.file_completed
+
+        def interrupting_file_completed(base_url, filename):
+            file_completed(base_url, filename)
+            if len(parser.completed_files) >= stop_after:
+                raise KeyboardInterrupt
+        parser.file_completed = interrupting_file_completed
+    try:
+        parser.analyse_date_range(START_DATE, END_DATE, checkpoint=checkpoint, resume=resume)
+    except KeyboardInterrupt:
+        pass
+    return parser
+
+def check_checkpoint_phrases(corpus: str, work_dir: str) -> List[str]:
+    """Checkpointing, and resuming an interrupted run, give the same words and phrases as one uninterrupted run."""
+    mirror = os.path.join(corpus, 'scrapedxml')
+    output_file = os.path.join(work_dir, 'checkpointed.json')
+    expected = analyse_with_phrases(mirror)
+    expected = speaker_table_to_dict(expected.speakers, expected.vocab, 50)
+
+    checkpointed = analyse_with_phrases(mirror, RunCheckpoint(output_file, every=2))
+    analyse_with_phrases(mirror, RunCheckpoint(os.path.join(work_dir, 'resumed.json'), every=3), stop_after=7)
+    resumed = analyse_with_phrases(mirror, RunCheckpoint(os.path.join(work_dir, 'resumed.json'), every=3), resume=True)
+    # A run that stopped while saving has every file checkpointed already
+    finished = analyse_with_phrases(mirror, RunCheckpoint(output_file, every=2), resume=True, workers=2)
+
+    problems = []
+    for label, parser in (('checkpointed', checkpointed), ('resumed', resumed), ('resumed after saving', finished)):
+        problems += [f"{label} {problem}" for problem in
+                     compare('speaker', expected, speaker_table_to_dict(parser.speakers, parser.vocab, 50))]
+    return problems
+
+def check_parser_parity(corpus: str, work_dir: str) -> List[str]:
+    """The lxml and BeautifulSoup backends read the same speeches from every corpus file and the edge cases."""
+    mirror = os.path.join(corpus, 'scrapedxml')
+    debate_files = [('edge cases', EDGE_CASE_DEBATE)]
+    for path, filename in sorted(DirectorySource(mirror).list_files()):
+        with open(os.path.join(path, filename), 'rb') as f:
+            debate_files.append((filename, f.read()))
+
+    problems = []
+    for filename, content in debate_files:
+        for index, lxml_speech, bs4_speech in compare_backends(content):
+            if lxml_speech is None:
+                problems.append(f"{filename} has a different number of speeches from speech {index} on")
+            else:
+                problems.append(f"{filename} speech {index}: lxml read {lxml_speech!r} but bs4 read {bs4_speech!r}")
+    return problems
+
+# Each check returns a description of every difference it found
+CHECKS: Dict[str, Callable[[str, str], List[str]]] = {
+    'incremental_buckets': check_incremental_buckets,
+    'incremental_removed': check_incremental_removed,
+    'incremental_failed_listing': check_incremental_failed_listing,
+    'incremental_missing_output': check_incremental_missing_output,
+    'checkpoint_phrases': check_checkpoint_phrases,
+    'parser_parity': check_parser_parity,
+}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Check that the pipeline's shortcuts give the same results "
+                                                     "as doing the work in full, on a synthetic Hansard corpus.")
+    arg_parser.add_argument('--corpus', default='bench_corpus',
+                            help="Directory of the synthetic corpus, generated if missing or made with other settings")
+    arg_parser.add_argument('--days', type=int, default=20, help="Sitting days in the corpus")
+    arg_parser.add_argument('--speakers', type=int, default=200, help="MPs in the corpus")
+    arg_parser.add_argument('--vocabulary', type=int, default=20000, help="Distinct words in the corpus")
+    arg_parser.add_argument('--speeches-per-day', type=int, default=300, help="Speeches per sitting day")
+    arg_parser.add_argument('--seed', type=int, default=1, help="Random seed for the corpus")
+    arg_parser.add_argument('--only', nargs='+', choices=list(CHECKS), help="Only run these checks")
+    args = arg_parser.parse_args()
+
+    settings = {'days': args.days, 'speakers': args.speakers, 'vocabulary': args.vocabulary,
+                'speeches_per_day': args.speeches_per_day, 'seed': args.seed}
+    prepare_corpus(args.corpus, settings)
+
+    failures = 0
+    for name in args.only or CHECKS:
+        with tempfile.TemporaryDirectory() as work_dir:
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+                problems = CHECKS[name](args.corpus, work_dir)
+        if problems:
+            failures += 1
+            print(f"{name}: FAILED")
+            for problem in problems[:20]:
+                print(f"- {problem}")
+            if len(problems) > 20:
+                print(f"- ...and {len(problems) - 20} more")
+        else:
+            print(f"{name}: ok")
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, List
+from xml.sax.saxutils import escape, quoteattr
+
+# The most frequent words get realistic English spellings, so stop word filtering has something to do
+COMMON_WORDS = [
+    'the', 'of', 'to', 'and', 'that', 'in', 'is', 'we', 'it', 'for', 'this', 'be', 'on', 'are', 'have',
+    'not', 'will', 'with', 'as', 'hon', 'friend', 'government', 'minister', 'people', 'house', 'member',
+    'what', 'they', 'by', 'has', 'but', 'at', 'he', 'she', 'from', 'which', 'would', 'there', 'all',
+    'can', 'been', 'do', 'was', 'our', 'very', 'more', 'those', 'about', 'their', 'also', 'support',
+    'secretary', 'state', 'gentleman', 'lady', 'right', 'bill', 'new', 'year', 'country', 'local',
+    'constituency', 'funding', 'schools', 'hospital', 'tariff', 'housing', 'energy', 'farmers', 'nhs'
+]
+
+SYLLABLES = ['ba', 'ri', 'con', 'stit', 'u', 'en', 'cy', 'tar', 'iff', 'lo', 'cal', 'gov', 'ern', 'ment',
+             'pol', 'ic', 'y', 'hous', 'ing', 'mar', 'ket', 'ex', 'port', 'dev', 'ol', 'ved', 'pen', 'sion']
+
+FIRST_NAMES = ['Jane', 'John', 'Sarah', 'David', 'Emma', 'James', 'Priya', 'Mohammed', 'Olivia', 'Thomas',
+               'Aisha', 'Daniel', 'Grace', 'Edward', 'Fiona', 'Rhys', 'Siobhan', 'Alistair', 'Jessica', 'Christopher']
+LAST_NAMES = ['Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Patel', 'Khan', 'Evans', 'Thomas',
+              'Roberts', 'Walker', 'Wright', 'Hughes', 'Green', 'Hall', 'Wood', 'Clarke', 'Jackson', 'Murphy']
+PARTIES = ['Labour', 'Conservative', 'Liberal Democrat', 'Scottish National Party', 'Green Party', 'Independent']
+
+# Name forms Hansard uses for someone listed in the Members API under their full name
+NICKNAMES = {'Jessica': 'Jess', 'Christopher': 'Chris', 'Alistair': 'Al', 'Edward': 'Ed', 'Thomas': 'Tom', 'Daniel': 'Dan'}
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Return `size` distinct words, most frequent first."""
+    words = list(COMMON_WORDS[:size])
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.02:
+            word = str(rng.randint(1, 2030))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def make_members(count: int, rng: random.Random) -> List[Dict]:
+    """Return `count` MPs as Members API 'value' objects with distinct names."""
+    members = []
+    names = set()
+    while len(members) < count:
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        if name in names:
+            name = f"{name}-{rng.choice(LAST_NAMES)}"
+            if name in names:
+                continue
+        names.add(name)
+        member_id = 1000 + len(members)
+        members.append({
+            'id': member_id,
+            'nameDisplayAs': name,
+            'latestParty': {'name': rng.choice(PARTIES)},
+            'latestHouseMembership': {
+                'membershipFrom': f"Constituency {member_id}",
+                'constituency': {'name': f"Constituency {member_id}"}
+            }
+        })
+    return members
+
+def hansard_name(member: Dict, rng: random.Random) -> str:
+    """The name a member speaks under in Hansard, sometimes a nickname or with a title."""
+    first, _, rest = member['nameDisplayAs'].partition(' ')
+    if first in NICKNAMES and rng.random() < 0.5:
+        first = NICKNAMES[first]
+    name = f"{first} {rest}"
+    if rng.random() < 0.1:
+        name = f"{rng.choice(['Mr', 'Ms', 'Dr', 'Sir', 'Dame'])} {name}"
+    return name
+
+def write_debate_file(path: str, prefix: str, sitting: str, speeches: List[tuple]):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<publicwhip scrapeversion="a" latest="yes">\n')
+        f.write(f'<major-heading id="uk.org.publicwhip/{prefix}/{sitting}a.1.0" nospeaker="true" colnum="1">Business</major-heading>\n')
+        for i, (speaker_name, person_id, paragraphs) in enumerate(speeches, 1):
+            f.write(f'<speech id="uk.org.publicwhip/{prefix}/{sitting}a.1.{i}" speakername={quoteattr(speaker_name)} '
+                    f'person_id="{person_id}" colnum="{i // 10 + 1}" time="09:{i % 60:02d}:00">')
+            for j, paragraph in enumerate(paragraphs):
+                f.write(f'<p pid="a1.{i}/{j}">{escape(paragraph)}</p>')
+            f.write('</speech>\n')
+        f.write('</publicwhip>\n')
+
+def generate_corpus(out_dir: str, days: int = 20, speakers: int = 200, vocabulary: int = 20000,
+                    speeches_per_day: int = 300, seed: int = 1) -> Dict:
+    """Write a synthetic Hansard and Members API corpus to out_dir and return a summary of it.
+
+    - scrapedxml/debates/ and scrapedxml/westminhall/: TheyWorkForYou-style debate XML, one
+      file per sitting day, with words drawn from a Zipf-like distribution
+    - members_search.json: every MP as Members/Search API pages
+    - mps_data.json: the MPs as mp_data_fetcher.py saves them
+    - speaker_statistics.json: the word counts parse_debates.py produces for the corpus
+    """
+    rng = random.Random(seed)
+    words = make_vocabulary(vocabulary, rng)
+    cumulative_weights = list(accumulate(1 / (rank + 2.7) for rank in range(len(words))))
+    members = make_members(speakers, rng)
+    speaker_names = [(hansard_name(member, rng), f"uk.org.publicwhip/person/{member['id']}") for member in members]
+    # Some MPs speak far more often than others
+    speaker_weights = [rng.paretovariate(1.2) for _ in members]
+
+    for directory in ('debates', 'westminhall'):
+        os.makedirs(os.path.join(out_dir, 'scrapedxml', directory), exist_ok=True)
+
+    statistics: Dict[str, Dict] = {}
+    sitting = date(2025, 1, 6)
+    speech_total = word_total = 0
+    for day in range(days):
+        while sitting.weekday() >= 5:
+            sitting += timedelta(days=1)
+        for directory, prefix, filename_prefix, share in (('debates', 'debate', 'debates', 0.75),
+                                                          ('westminhall', 'westminhall', 'westminster', 0.25)):
+            speeches = []
+            for _ in range(max(1, int(speeches_per_day * share))):
+                speaker_name, person_id = rng.choices(speaker_names, weights=speaker_weights)[0]
+                paragraphs = []
+                for _ in range(rng.randint(1, 4)):
+                    length = int(rng.lognormvariate(3.5, 0.8)) + 3
+                    paragraphs.append(' '.join(rng.choices(words, cum_weights=cumulative_weights, k=length)).capitalize() + '.')
+                speeches.append((speaker_name, person_id, paragraphs))
+
+                speaker_stats = statistics.setdefault(speaker_name, {'person_id': person_id, 'total_speeches': 0, 'word_counts': {}})
+                speaker_stats['total_speeches'] += 1
+                for paragraph in paragraphs:
+                    for word in paragraph.lower().rstrip('.').split():
+                        if len(word) > 1:
+                            speaker_stats['word_counts'][word] = speaker_stats['word_counts'].get(word, 0) + 1
+                            word_total += 1
+            speech_total += len(speeches)
+            path = os.path.join(out_dir, 'scrapedxml', directory, f"{filename_prefix}{sitting.isoformat()}a.xml")
+            write_debate_file(path, prefix, sitting.isoformat(), speeches)
+        sitting += timedelta(days=1)
+
+    page_size = 20
+    pages = [{'items': [{'value': member} for member in members[skip:skip + page_size]], 'totalResults': len(members),
+              'skip': skip, 'take': page_size} for skip in range(0, len(members), page_size)]
+    with open(os.path.join(out_dir, 'members_search.json'), 'w', encoding='utf-8') as f:
+        json.dump(pages, f)
+
+    mps_data = [{
+        'name': member['nameDisplayAs'],
+        'person_id': f"uk.org.publicwhip/person/{member['id'] + 50000}",
+        'party_affiliation': member['latestParty']['name'],
+        'constituency': member['latestHouseMembership']['membershipFrom'],
+        'portrait_URL': f"https://members-api.parliament.uk/api/members/{member['id']}/Portrait?cropType=ThreeFour"
+    } for member in members]
+    with open(os.path.join(out_dir, 'mps_data.json'), 'w', encoding='utf-8') as f:
+        json.dump(mps_data, f, indent=4)
+
+    with open(os.path.join(out_dir, 'speaker_statistics.json'), 'w', encoding='utf-8') as f:
+        json.dump(statistics, f, indent=2, ensure_ascii=False)
+
+    summary = {
+        'days': days, 'speakers': speakers, 'vocabulary': vocabulary, 'speeches_per_day': speeches_per_day,
+        'seed': seed, 'debate_files': days * 2, 'speeches': speech_total, 'words': word_total
+    }
+    with open(os.path.join(out_dir, 'corpus.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic Hansard and Members API corpus for benchmarking.")
+    arg_parser.add_argument('--out', default='bench_corpus', help="Directory to write the corpus to")
+    arg_parser.add_argument('--days', type=int, default=20, help="Number of sitting days")
+    arg_parser.add_argument('--speakers', type=int, default=200, help="Number of MPs")
+    arg_parser.add_argument('--vocabulary', type=int, default=20000, help="Number of distinct words")
+    arg_parser.add_argument('--speeches-per-day', type=int, default=300, help="Speeches per sitting day")
+    arg_parser.add_argument('--seed', type=int, default=1, help="Random seed, so a corpus can be regenerated exactly")
+    args = arg_parser.parse_args()
+
+    summary = generate_corpus(args.out, args.days, args.speakers, args.vocabulary, args.speeches_per_day, args.seed)
+    print(f"Wrote {summary['debate_files']} debate files with {summary['speeches']} speeches "
+          f"({summary['words']} words) for {summary['speakers']} MPs to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from generate_corpus import generate_corpus
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for directory in ('MP_Speech_Scraper', 'JSON_Sanitiser', 'MP_ID_Standardise', 'Shared_Utils'):
+    sys.path.insert(0, os.path.join(REPO_ROOT, directory))
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark's setup when something it needs is not installed."""
+
+# A benchmark's setup returns the function to time and how much work one call of it does,
+# e.g. {'speeches': 6000}; the first entry is the unit its throughput is reported in
+Benchmark = Tuple[Callable[[], None], Dict[str, int]]
+
+def bench_analyse_debate_file(corpus: str) -> Benchmark:
+    """Every debate file read, parsed and counted by DebateParser.analyse_debate_file."""
+    from parse_debates import DebateParser
+    from debate_sources import DirectorySource
+
+    source = DirectorySource(os.path.join(corpus, 'scrapedxml'))
+    debate_files = sorted(source.list_files())
+    size = sum(os.path.getsize(os.path.join(path, filename)) for path, filename in debate_files)
+    with open(os.path.join(corpus, 'corpus.json'), 'r', encoding='utf-8') as f:
+        speeches = json.load(f)['speeches']
+
+    def run():
+        parser = DebateParser(source=source)
+        for debate_file in debate_files:
+            parser.analyse_debate_file(*debate_file)
+
+    return run, {'speeches': speeches, 'files': len(debate_files), 'bytes': size}
+
+def bench_analyse_speech(corpus: str) -> Benchmark:
+    """Word counting of already parsed speeches by DebateParser.analyse_speech."""
+    from parse_debates import DebateParser
+    from debate_sources import DirectorySource
+
+    source = DirectorySource(os.path.join(corpus, 'scrapedxml'))
+    parser = DebateParser(source=source)
+    speeches = [speech for debate_file in sorted(source.list_files()) for speech in parser.parse_debate_file(*debate_file)]
+
+    def run():
+        parser = DebateParser(source=source)
+        for speech in speeches:
+            parser.analyse_speech(*speech)
+
+    return run, {'speeches': len(speeches), 'characters': sum(len(text) for _, _, text in speeches)}
+
+def import_sanitiser():
+    """Import sanitise_json and load its spaCy model, skipping the benchmark if either is missing."""
+    import sanitise_json
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            sanitise_json.get_nlp()
+    except (ImportError, OSError) as e:
+        # spaCy or its en_core_web_sm model is not installed
+        raise BenchmarkSkipped(str(e))
+    return sanitise_json
+
+def bench_should_keep_word(corpus: str) -> Benchmark:
+    """The sanitiser's word filtering: judging each distinct word, then filtering every speaker's words."""
+    from speaker_stats_io import load_speaker_statistics
+
+    sanitise_json = import_sanitiser()
+    statistics = load_speaker_statistics(os.path.join(corpus, 'speaker_statistics.json'))
+    all_words = sanitise_json.collect_words(statistics)
+    sanitise_json.analyze_words_batch(list(all_words))
+
+    def run():
+        keep_words = sanitise_json.build_keep_set(all_words)
+        for _ in sanitise_json.sanitise_records(statistics.items(), keep_words):
+            pass
+
+    return run, {'words': sum(len(speaker_data['word_counts']) for speaker_data in statistics.values()),
+                 'distinct_words': len(all_words)}
+
+def bench_match_mps(corpus: str) -> Benchmark:
+    """Matching every MP in the Members API data to a Hansard speaker with standardise_ids.match_mps."""
+    from standardise_ids import load_json_file, load_speaker_ids, match_mps
+
+    mps_data = load_json_file(os.path.join(corpus, 'mps_data.json'))
+    speaker_stats = load_speaker_ids(os.path.join(corpus, 'speaker_statistics.json'))
+
+    def run():
+        match_mps(mps_data, speaker_stats)
+
+    return run, {'mps': len(mps_data), 'speakers': len(speaker_stats)}
+
+def bench_create_csv_for_mps(corpus: str) -> Benchmark:
+    """Exporting every speaker's word counts with CSVMaker.create_csv_for_mps."""
+    from CSVMaker import create_csv_for_mps
+    from speaker_stats_io import iter_speaker_records
+
+    input_file = os.path.join(corpus, 'speaker_statistics.json')
+    output_file = os.path.join(corpus, 'bench_mp_statistics.csv')
+    mp_names = []
+    rows = 0
+    for speaker, speaker_data in iter_speaker_records(input_file):
+        mp_names.append(speaker)
+        rows += len(speaker_data['word_counts'])
+
+    def run():
+        create_csv_for_mps(mp_names, output_file, input_file)
+
+    return run, {'rows': rows, 'mps': len(mp_names)}
+
+BENCHMARKS: Dict[str, Callable[[str], Benchmark]] = {
+    'analyse_debate_file': bench_analyse_debate_file,
+    'analyse_speech': bench_analyse_speech,
+    'should_keep_word': bench_should_keep_word,
+    'match_mps': bench_match_mps,
+    'create_csv_for_mps': bench_create_csv_for_mps
+}
+
+def peak_rss_mb() -> Optional[float]:
+    """This process's peak resident memory in MB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def time_run(run: Callable[[], None], min_seconds: float = 0.2) -> float:
+    """Seconds one call of run takes, calling it repeatedly if it is too quick to time on its own."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        run()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def run_benchmark(name: str, corpus: str, repeat: int) -> Dict:
+    """Time one benchmark and measure its memory. Run in a fresh process, so peaks are its own."""
+    try:
+        run, work = BENCHMARKS[name](corpus)
+    except BenchmarkSkipped as e:
+        return {'skipped': str(e)}
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        timings = []
+        for _ in range(repeat):
+            gc.collect()
+            timings.append(time_run(run))
+
+        # Memory is traced on a separate run, as tracing slows everything down
+        gc.collect()
+        tracemalloc.start()
+        run()
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    unit, items = next(iter(work.items()))
+    seconds = min(timings)
+    return {
+        'unit': unit,
+        'throughput': round(items / seconds, 1),
+        'seconds': round(seconds, 4),
+        'peak_traced_mb': round(peak_traced / (1024 * 1024), 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'work': work
+    }
+
+def prepare_corpus(corpus: str, settings: Dict) -> Dict:
+    """Reuse the corpus in the given directory if it was generated with these settings, otherwise (re)generate it."""
+    summary_file = os.path.join(corpus, 'corpus.json')
+    if os.path.exists(summary_file):
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        if all(summary.get(key) == value for key, value in settings.items()):
+            return summary
+        shutil.rmtree(os.path.join(corpus, 'scrapedxml'), ignore_errors=True)
+
+    print(f"Generating synthetic corpus in {corpus}...")
+    return generate_corpus(corpus, **settings)
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Print each benchmark against the baseline and return the regressions."""
+    regressions = []
+    if baseline.get('corpus') != results['corpus']:
+        print("Warning: the baseline was recorded on a different corpus, so the comparison is not like for like")
+
+    print(f"\n{'benchmark':<22}{'throughput':>24}{'change':>10}{'peak MB':>12}{'change':>10}")
+    for name, result in results['benchmarks'].items():
+        if 'skipped' in result:
+            print(f"{name:<22}  skipped: {result['skipped']}")
+            continue
+        previous = baseline.get('benchmarks', {}).get(name)
+        throughput = f"{result['throughput']:,.1f} {result['unit']}/s"
+        if not previous or 'skipped' in previous:
+            print(f"{name:<22}{throughput:>24}{'new':>10}{result['peak_traced_mb']:>12.2f}")
+            continue
+
+        speed_change = result['throughput'] / previous['throughput'] - 1
+        memory_change = (result['peak_traced_mb'] / previous['peak_traced_mb'] - 1) if previous['peak_traced_mb'] else 0.0
+        flags = []
+        if speed_change < -tolerance:
+            flags.append('SLOWER')
+            regressions.append(f"{name} throughput fell {-speed_change:.0%}")
+        if memory_change > tolerance:
+            flags.append('MORE MEMORY')
+            regressions.append(f"{name} peak memory rose {memory_change:.0%}")
+        print(f"{name:<22}{throughput:>24}{speed_change:>+10.1%}{result['peak_traced_mb']:>12.2f}{memory_change:>+10.1%}"
+              f"{'  ' + ', '.join(flags) if flags else ''}")
+    return regressions
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against a synthetic Hansard corpus.")
+    arg_parser.add_argument('--corpus', default='bench_corpus',
+                            help="Directory of the synthetic corpus, generated if missing or made with other settings")
+    arg_parser.add_argument('--days', type=int, default=20, help="Sitting days in the corpus")
+    arg_parser.add_argument('--speakers', type=int, default=200, help="MPs in the corpus")
+    arg_parser.add_argument('--vocabulary', type=int, default=20000, help="Distinct words in the corpus")
+    arg_parser.add_argument('--speeches-per-day', type=int, default=300, help="Speeches per sitting day")
+    arg_parser.add_argument('--seed', type=int, default=1, help="Random seed for the corpus")
+    arg_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="Only run these benchmarks")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark; the fastest is kept")
+    arg_parser.add_argument('--output', default='benchmark_results.json', help="File to save this run's results to")
+    arg_parser.add_argument('--baseline', default='benchmark_baseline.json', help="Results to compare against")
+    arg_parser.add_argument('--save-baseline', action='store_true', help="Save this run's results as the new baseline")
+    arg_parser.add_argument('--tolerance', type=float, default=0.15,
+                            help="Flag a regression when throughput falls or peak memory rises by more than this fraction")
+    args = arg_parser.parse_args()
+
+    settings = {'days': args.days, 'speakers': args.speakers, 'vocabulary': args.vocabulary,
+                'speeches_per_day': args.speeches_per_day, 'seed': args.seed}
+    summary = prepare_corpus(args.corpus, settings)
+    print(f"Corpus: {summary['debate_files']} debate files, {summary['speeches']} speeches, {summary['words']} words")
+
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus': summary,
+        'benchmarks': {}
+    }
+    # Each benchmark gets a fresh process, so one's imports and caches do not flatter the next
+    context = get_context('spawn')
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results['benchmarks'][name] = executor.submit(run_benchmark, name, args.corpus, args.repeat).result()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline or {'corpus': summary}, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if regressions and not args.save_baseline:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,191 @@
 import json
 import csv
+import heapq
+import os
 import sys
-from typing import List, Dict
+import argparse
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-def load_cleaned_statistics(file_path: str = 'cleaned_speaker_statistics.json') -> Dict:
-    """Load the cleaned speaker statistics from JSON file."""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import iter_speaker_records
+from parliament_db import CLEANED_DATASET, ParliamentDB
+
+# Columns of the CSV, one row per word per MP
+CSV_FIELDS = ['MP_Name', 'Person_ID', 'Total_Speeches', 'Word', 'Count']
+
+def mp_keys(speaker: str, speaker_data: Dict) -> List[str]:
+    """The ways an MP can be asked for: their case-folded name, their person_id or its number alone."""
+    keys = [speaker.casefold()]
+    person_id = speaker_data.get('person_id')
+    if person_id:
+        keys.append(str(person_id).casefold())
+        keys.append(str(person_id).rsplit('/', 1)[-1])
+    return keys
+
+def load_cleaned_statistics(file_path: str = 'cleaned_speaker_statistics.json',
+                            mp_names: Optional[List[str]] = None) -> Dict:
+    """Load the cleaned speaker statistics from a .json, .ndjson or .msgpack file.
+
+    If mp_names (names or person_ids, in any case) is given, speakers are streamed from the
+    file and only those MPs are kept.
+    """
+    wanted = {name.casefold() for name in mp_names} if mp_names is not None else None
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return {
+            speaker: speaker_data for speaker, speaker_data in iter_speaker_records(file_path)
+            if wanted is None or not wanted.isdisjoint(mp_keys(speaker, speaker_data))
+        }
     except FileNotFoundError:
         print(f"Error: Could not find {file_path}")
         sys.exit(1)
-    except json.JSONDecodeError:
-        print(f"Error: {file_path} is not a valid JSON file")
+    except (json.JSONDecodeError, ValueError):
+        print(f"Error: {file_path} is not a valid statistics file")
         sys.exit(1)
 
-def find_mp_case_insensitive(mp_name: str, statistics: Dict) -> str:
-    """Find the exact MP name in statistics using case-insensitive matching."""
-    mp_name_lower = mp_name.lower()
-    for name in statistics.keys():
-        if name.lower() == mp_name_lower:
-            return name
-    return None
-
-def create_csv_for_mps(mp_names: List[str], output_file: str = 'mp_statistics.csv'):
-    """Create a CSV file containing statistics for specified MPs."""
-    # Load the cleaned statistics
-    statistics = load_cleaned_statistics()
-    
-    # Prepare the data for CSV
-    csv_data = []
-    
-    for mp_name in mp_names:
-        # Find the exact name with correct case
-        exact_name = find_mp_case_insensitive(mp_name, statistics)
-        
-        if not exact_name:
-            print(f"Warning: No data found for MP: {mp_name}")
-            continue
-            
-        mp_data = statistics[exact_name]
-        
-        # Create a row for each word count
-        for word, count in mp_data['word_counts'].items():
-            csv_data.append({
-                'MP_Name': exact_name,  # Use the exact name from the data
-                'Person_ID': mp_data['person_id'],
-                'Total_Speeches': mp_data['total_speeches'],
-                'Word': word,
-                'Count': count
-            })
-    
-    # Write to CSV
-    if not csv_data:
+def build_mp_index(statistics: Dict) -> Dict[str, str]:
+    """Map every case-folded name and person_id in statistics to the MP's exact name."""
+    index = {}
+    for speaker, speaker_data in statistics.items():
+        for key in mp_keys(speaker, speaker_data):
+            index.setdefault(key, speaker)
+    return index
+
+def find_mp_case_insensitive(mp_name: str, statistics: Dict, index: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Find the exact MP name in statistics from a name (in any case) or person_id."""
+    if index is None:
+        index = build_mp_index(statistics)
+    return index.get(mp_name.casefold())
+
+def top_words(word_counts: Dict[str, int], n: int) -> List[Tuple[str, int]]:
+    """The n most used words, most used first, picked with a heap rather than sorting every word."""
+    return heapq.nlargest(n, word_counts.items(), key=itemgetter(1))
+
+def iter_mp_rows(mp_name: str, mp_data: Dict, top: Optional[int] = None) -> Iterator[list]:
+    """Yield a CSV row for each of an MP's words, or only their top most used words."""
+    word_counts = mp_data['word_counts']
+    words = top_words(word_counts, top) if top else word_counts.items()
+    for word, count in words:
+        yield [mp_name, mp_data['person_id'], mp_data['total_speeches'], word, count]
+
+def write_csv_rows(output_file: str, rows: Iterable[list]) -> int:
+    """Write rows to a CSV file as they are produced, returning how many were written.
+
+    The file is written under a temporary name and renamed into place once complete. If there
+    are no rows at all, no file is written.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
         print("No data to write to CSV")
-        return
-        
-    fieldnames = ['MP_Name', 'Person_ID', 'Total_Speeches', 'Word', 'Count']
-    
+        return 0
+
+    written = 0
+    tmp_path = f"{output_file}.tmp"
     try:
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(csv_data)
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_FIELDS)
+            writer.writerow(first)
+            written = 1
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+        os.replace(tmp_path, output_file)
         print(f"Successfully created {output_file}")
     except Exception as e:
         print(f"Error writing to CSV: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python CSVMaker.py 'MP Name 1' 'MP Name 2' ...")
-        print("Example: python CSVMaker.py 'John Smith' 'Jane Doe'")
+def create_csv_for_mps(mp_names: List[str], output_file: str = 'mp_statistics.csv',
+                       input_file: str = 'cleaned_speaker_statistics.json', top: Optional[int] = None) -> int:
+    """Create a CSV file containing statistics for specified MPs, by name or person_id.
+
+    With top, only each MP's top most used words are included. Returns the number of rows written.
+    """
+    # Load the cleaned statistics of just the requested MPs
+    statistics = load_cleaned_statistics(input_file, mp_names)
+    index = build_mp_index(statistics)
+
+    def rows():
+        for mp_name in mp_names:
+            # Find the exact name with correct case
+            exact_name = find_mp_case_insensitive(mp_name, statistics, index)
+            if not exact_name:
+                print(f"Warning: No data found for MP: {mp_name}")
+                continue
+            yield from iter_mp_rows(exact_name, statistics[exact_name], top)
+
+    return write_csv_rows(output_file, rows())
+
+def create_csv_for_all_mps(output_file: str = 'mp_statistics.csv',
+                           input_file: str = 'cleaned_speaker_statistics.json', top: Optional[int] = None) -> int:
+    """Create a CSV file containing statistics for every MP, reading and writing one MP at a time.
+
+    With top, only each MP's top most used words are included. Returns the number of rows written.
+    """
+    def rows():
+        for speaker, speaker_data in iter_speaker_records(input_file):
+            yield from iter_mp_rows(speaker, speaker_data, top)
+
+    try:
+        return write_csv_rows(output_file, rows())
+    except FileNotFoundError:
+        print(f"Error: Could not find {input_file}")
         sys.exit(1)
-    
-    # Get MP names from command line arguments
-    mp_names = sys.argv[1:]
+    except (json.JSONDecodeError, ValueError):
+        print(f"Error: {input_file} is not a valid statistics file")
+        sys.exit(1)
+
+def create_csv_from_db(db_path: str, mp_names: Optional[List[str]] = None, output_file: str = 'mp_statistics.csv',
+                       dataset: str = CLEANED_DATASET, top: Optional[int] = None) -> int:
+    """Create a CSV file from the statistics in the database, for the given MPs (by name or person_id) or every MP.
+
+    MPs are found through the database's name and person_id indexes, and with top the most
+    used words are picked by the query. Returns the number of rows written.
+    """
+    with ParliamentDB(db_path) as db:
+        if mp_names is None:
+            records = db.iter_speaker_records(dataset, top)
+        else:
+            def find_records():
+                for mp_name in mp_names:
+                    found = db.find_speaker(dataset, mp_name)
+                    if not found:
+                        print(f"Warning: No data found for MP: {mp_name}")
+                        continue
+                    speaker_id, exact_name = found
+                    yield exact_name, db.speaker_data(speaker_id, top)
+            records = find_records()
+        return write_csv_rows(output_file, (row for mp_name, mp_data in records for row in iter_mp_rows(mp_name, mp_data)))
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export the word counts of the given MPs to CSV.",
+                                         epilog="Example: python CSVMaker.py 'John Smith' 'Jane Doe'")
+    arg_parser.add_argument('mp_names', nargs='*', metavar='MP', help="Names or person_ids of the MPs to export")
+    arg_parser.add_argument('--all', action='store_true', help="Export every MP in the statistics")
+    arg_parser.add_argument('--top', type=int, help="Only export each MP's N most used words")
+    arg_parser.add_argument('--input', default='cleaned_speaker_statistics.json',
+                            help="Cleaned statistics to read (.json, .ndjson or .msgpack)")
+    arg_parser.add_argument('--output', default='mp_statistics.csv', help="CSV file to write")
+    arg_parser.add_argument('--db', help="Read the statistics from this SQLite database instead of --input")
+    arg_parser.add_argument('--dataset', default=CLEANED_DATASET,
+                            help="Statistics in the database to export ('cleaned' or 'raw')")
+    args = arg_parser.parse_args()
+    if args.all == bool(args.mp_names):
+        arg_parser.error("give either the names of the MPs to export or --all")
+    if args.top is not None and args.top < 1:
+        arg_parser.error("--top must be at least 1")
     
     # Create the CSV file
-    create_csv_for_mps(mp_names)
+    if args.db:
+        create_csv_from_db(args.db, None if args.all else args.mp_names, args.output, args.dataset, args.top)
+    elif args.all:
+        create_csv_for_all_mps(args.output, args.input, args.top)
+    else:
+        create_csv_for_mps(args.mp_names, args.output, args.input, args.top)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
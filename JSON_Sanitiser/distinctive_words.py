@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import iter_speaker_records
+
+# A speakers x vocabulary count matrix with its row labels (name, person_id) and column labels (words)
+SpeakerMatrix = Tuple[sparse.csr_matrix, List[Tuple[str, str]], List[str]]
+
+def build_speaker_matrix(statistics: Union[Dict, Iterable[Tuple[str, Dict]]]) -> SpeakerMatrix:
+    """Turn speaker statistics into a sparse CSR matrix with one row per speaker and one column per word.
+
+    `statistics` is either a {speaker: data} dict or a stream of (speaker, data) pairs, so
+    only the matrix itself (12 bytes per non-zero count) is ever held in memory.
+    """
+    records = statistics.items() if isinstance(statistics, dict) else statistics
+    word_ids: Dict[str, int] = {}
+    speakers = []
+    indptr = [0]
+    index_chunks = []
+    count_chunks = []
+    for speaker, speaker_data in records:
+        word_counts = speaker_data.get('word_counts', {})
+        speakers.append((speaker, speaker_data.get('person_id')))
+        index_chunks.append(np.fromiter((word_ids.setdefault(word, len(word_ids)) for word in word_counts),
+                                        dtype=np.int32, count=len(word_counts)))
+        count_chunks.append(np.fromiter(word_counts.values(), dtype=np.int32, count=len(word_counts)))
+        indptr.append(indptr[-1] + len(word_counts))
+
+    indices = np.concatenate(index_chunks) if index_chunks else np.zeros(0, dtype=np.int32)
+    counts = np.concatenate(count_chunks) if count_chunks else np.zeros(0, dtype=np.int32)
+    matrix = sparse.csr_matrix((counts, indices, np.array(indptr, dtype=np.int64)),
+                               shape=(len(speakers), len(word_ids)))
+    matrix.sort_indices()
+    return matrix, speakers, list(word_ids)
+
+def save_speaker_matrix(path: str, matrix: sparse.csr_matrix, speakers: List[Tuple[str, str]], words: List[str]):
+    """Save a speaker matrix and its labels to a single compressed .npz file."""
+    np.savez_compressed(
+        path,
+        data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=np.array(matrix.shape),
+        speaker_names=np.array([name for name, _ in speakers], dtype=str),
+        person_ids=np.array([person_id or '' for _, person_id in speakers], dtype=str),
+        words=np.array(words, dtype=str)
+    )
+
+def load_speaker_matrix(path: str) -> SpeakerMatrix:
+    """Load a speaker matrix saved by save_speaker_matrix."""
+    with np.load(path) as saved:
+        matrix = sparse.csr_matrix((saved['data'], saved['indices'], saved['indptr']), shape=tuple(saved['shape']))
+        speakers = list(zip(saved['speaker_names'].tolist(), saved['person_ids'].tolist()))
+        return matrix, speakers, saved['words'].tolist()
+
+def _row_indices(matrix: sparse.csr_matrix) -> np.ndarray:
+    """The row of every stored entry of a CSR matrix."""
+    return np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+
+def tfidf_scores(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Score every (speaker, word) by its share of the speaker's words times log(speakers / speakers using it)."""
+    counts = matrix.astype(np.float64)
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    speakers_using = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log(counts.shape[0] / np.maximum(speakers_using, 1))
+
+    scores = counts.copy()
+    scores.data = counts.data / totals[_row_indices(counts)] * idf[counts.indices]
+    return scores
+
+def log_odds_scores(matrix: sparse.csr_matrix, prior_strength: float = 500.0) -> sparse.csr_matrix:
+    """Score every (speaker, word) by the z-score of its log-odds ratio against all other speakers.
+
+    Uses the informative Dirichlet prior of Monroe, Colaresi & Quinn (2008): `prior_strength`
+    pseudo-counts are spread over the vocabulary in proportion to each word's overall use,
+    which stops rare words from dominating the way they do with raw ratios.
+    """
+    counts = matrix.astype(np.float64)
+    rows = _row_indices(counts)
+    word_totals = np.asarray(counts.sum(axis=0)).ravel()
+    speaker_totals = np.asarray(counts.sum(axis=1)).ravel()
+    corpus_total = word_totals.sum()
+    alpha = prior_strength * word_totals / corpus_total
+
+    own = counts.data
+    rest = word_totals[counts.indices] - own
+    a = alpha[counts.indices]
+    own_total = speaker_totals[rows]
+    rest_total = corpus_total - own_total
+
+    delta = (np.log((own + a) / (own_total + prior_strength - own - a))
+             - np.log((rest + a) / (rest_total + prior_strength - rest - a)))
+    variance = 1 / (own + a) + 1 / (rest + a)
+
+    scores = counts.copy()
+    scores.data = delta / np.sqrt(variance)
+    return scores
+
+SCORING_METHODS = {
+    'tfidf': tfidf_scores,
+    'logodds': log_odds_scores
+}
+
+def top_words(scores: sparse.csr_matrix, counts: sparse.csr_matrix, k: int = 10,
+              min_count: int = 1) -> List[List[Tuple[int, float, int]]]:
+    """Return the k highest scoring (word index, score, count) of every row, ignoring words used fewer than min_count times.
+
+    `scores` must have the same stored entries as `counts`, as the scoring functions return.
+    Rows are ranked all at once with a single lexsort over the stored entries.
+    """
+    rows = _row_indices(scores)
+    keep = counts.data >= min_count
+    rows, words, values, word_counts = rows[keep], scores.indices[keep], scores.data[keep], counts.data[keep]
+
+    order = np.lexsort((words, -values, rows))
+    rows, words, values, word_counts = rows[order], words[order], values[order], word_counts[order]
+    row_starts = np.searchsorted(rows, np.arange(scores.shape[0]))
+    rank = np.arange(len(rows)) - row_starts[rows]
+    selected = rank < k
+
+    results = [[] for _ in range(scores.shape[0])]
+    for row, word, value, count in zip(rows[selected].tolist(), words[selected].tolist(),
+                                       values[selected].tolist(), word_counts[selected].tolist()):
+        results[row].append((word, value, count))
+    return results
+
+def distinctive_words(matrix: sparse.csr_matrix, speakers: List[Tuple[str, str]], words: List[str],
+                      method: str = 'logodds', k: int = 10, min_count: int = 3) -> Dict[str, List[Dict]]:
+    """Return each speaker's k most distinctive words as {speaker: [{'word', 'score', 'count'}]}."""
+    scores = SCORING_METHODS[method](matrix)
+    results = {}
+    for (speaker, _), ranked in zip(speakers, top_words(scores, matrix, k, min_count)):
+        results[speaker] = [{'word': words[word], 'score': round(score, 4), 'count': count}
+                            for word, score, count in ranked]
+    return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export a speaker x word matrix and find each speaker's most distinctive words.")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Save speaker statistics as a sparse matrix")
+    export_parser.add_argument('--input', default='cleaned_speaker_statistics.json',
+                               help="Speaker statistics to export (.json, .ndjson or .msgpack)")
+    export_parser.add_argument('--matrix', default='speaker_words.npz', help="File to save the matrix to")
+
+    top_parser = subparsers.add_parser('top', help="Show each speaker's most distinctive words")
+    source_group = top_parser.add_mutually_exclusive_group()
+    source_group.add_argument('--matrix', help="Matrix saved by the export command")
+    source_group.add_argument('--input', default='cleaned_speaker_statistics.json',
+                              help="Speaker statistics to score directly (.json, .ndjson or .msgpack)")
+    top_parser.add_argument('--method', choices=sorted(SCORING_METHODS), default='logodds',
+                            help="Weighted log-odds against all other speakers, or TF-IDF")
+    top_parser.add_argument('--top', type=int, default=10, help="Number of words per speaker")
+    top_parser.add_argument('--min-count', type=int, default=3,
+                            help="Ignore words a speaker used fewer times than this")
+    top_parser.add_argument('--speaker', help="Only show this speaker (name or person_id)")
+    top_parser.add_argument('--output', help="Also save every speaker's words to this JSON file")
+
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'top' and args.matrix:
+        print(f"Loading {args.matrix}...")
+        matrix, speakers, words = load_speaker_matrix(args.matrix)
+    else:
+        print(f"Reading {args.input}...")
+        matrix, speakers, words = build_speaker_matrix(iter_speaker_records(args.input))
+    print(f"{matrix.shape[0]} speakers x {matrix.shape[1]} words, {matrix.nnz} counts "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    if args.command == 'export':
+        save_speaker_matrix(args.matrix, matrix, speakers, words)
+        print(f"Matrix saved to {args.matrix}")
+        return
+
+    start = time.perf_counter()
+    results = distinctive_words(matrix, speakers, words, args.method, args.top, args.min_count)
+    print(f"Scored with {args.method} in {time.perf_counter() - start:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Distinctive words saved to {args.output}")
+
+    for speaker, person_id in speakers:
+        if args.speaker and args.speaker.lower() != speaker.lower() and args.speaker != person_id:
+            continue
+        print(f"\n{speaker}: {', '.join(entry['word'] for entry in results[speaker])}")
+
+if __name__ == "__main__":
+    main()
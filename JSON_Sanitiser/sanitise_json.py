@@ -1,11 +1,28 @@
-import json
-import spacy
+import argparse
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from tqdm import tqdm
-from collections import defaultdict
 
-# Load the English language model
-print("Loading spaCy model...")
-nlp = spacy.load("en_core_web_sm")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import (SpeakerRecord, is_streamed, iter_speaker_records, load_speaker_statistics,
+                              write_speaker_records)
+from metrics import RunMetrics
+from parliament_db import CLEANED_DATASET, ParliamentDB
+from tag_cache import TagCache
+
+# The spaCy model used to tag words, and the components of it the sanitiser never uses.
+# is_stop needs no component at all and pos_ comes from the tagger and attribute ruler.
+SPACY_MODEL = "en_core_web_sm"
+EXCLUDED_COMPONENTS = ["parser", "ner", "lemmatizer"]
+# With lemma folding on, the lemmatizer is kept so every word can be counted under its lemma
+LEMMA_EXCLUDED_COMPONENTS = ["parser", "ner"]
+
+# The loaded model, set by get_nlp() the first time a word needs tagging
+nlp = None
+
+# File spaCy's analyses are kept in between runs, so only new words go through the model
+TAG_CACHE_FILE = 'spacy_tag_cache.sqlite'
 
 # Define parliamentary procedural words to filter out
 PARLIAMENTARY_PROCEDURAL_WORDS = {
@@ -38,6 +55,10 @@ DO_NOT_REMOVE = {
 
 # Cache for spaCy analysis results
 spacy_cache = {}
+# Set by open_tag_cache(), after which every new analysis is also saved to disk
+tag_cache: Optional[TagCache] = None
+# Set by set_lemma_mode(): whether kept words are counted under their lemmas
+fold_lemmas = False
 
 def clean_word(word):
     """Clean a word by removing punctuation and converting to lowercase."""
@@ -45,24 +66,78 @@ def clean_word(word):
     word = ''.join(c for c in word if c.isalnum())
     return word
 
-def analyze_words_batch(words, batch_size=1000):
-    """Analyze a batch of words using spaCy."""
+def excluded_components() -> List[str]:
+    return LEMMA_EXCLUDED_COMPONENTS if fold_lemmas else EXCLUDED_COMPONENTS
+
+def set_lemma_mode(enabled: bool):
+    """Turn lemma folding on or off. Call it before open_tag_cache(), as the model and analyses differ."""
+    global fold_lemmas, nlp
+    if enabled != fold_lemmas:
+        fold_lemmas = enabled
+        nlp = None
+        spacy_cache.clear()
+
+def get_nlp():
+    """Load the spaCy model on first use, leaving out the components the sanitiser does not need."""
+    global nlp
+    if nlp is None:
+        import spacy
+        print("Loading spaCy model...")
+        nlp = spacy.load(SPACY_MODEL, exclude=excluded_components())
+    return nlp
+
+def model_key() -> str:
+    """Name the spaCy and model versions (and components) that word analyses depend on."""
+    import spacy
+    model_version = spacy.util.get_package_version(SPACY_MODEL)
+    if model_version is None:
+        # The model is not an installed package, so its own metadata has to be read
+        model_version = get_nlp().meta.get('version')
+    return f"spacy {spacy.__version__}; {SPACY_MODEL} {model_version}; excluding {','.join(excluded_components())}"
+
+def open_tag_cache(path: str = TAG_CACHE_FILE) -> int:
+    """Load the analyses saved for this model into spacy_cache, and save new ones to path from now on.
+
+    Returns the number of analyses loaded.
+    """
+    global tag_cache
+    close_tag_cache()
+    tag_cache = TagCache(path, model_key())
+    cached = tag_cache.load()
+    spacy_cache.update(cached)
+    return len(cached)
+
+def close_tag_cache():
+    global tag_cache
+    if tag_cache is not None:
+        tag_cache.close()
+        tag_cache = None
+
+def analyze_words_batch(words, batch_size=1000, n_process=1):
+    """Analyze words using spaCy, in n_process processes for large vocabularies."""
     # Filter out words we've already analyzed
     words_to_analyze = [w for w in words if w not in spacy_cache]
     if not words_to_analyze:
         return
     
-    # Process words in batches
-    for i in range(0, len(words_to_analyze), batch_size):
-        batch = words_to_analyze[i:i + batch_size]
-        docs = list(nlp.pipe(batch))
-        for word, doc in zip(batch, docs):
-            if doc:
-                token = doc[0]
-                spacy_cache[word] = {
-                    'is_stop': token.is_stop,
-                    'pos': token.pos_
-                }
+    # One pipe over every word, so worker processes are only started once
+    docs = get_nlp().pipe(words_to_analyze, batch_size=batch_size, n_process=n_process)
+    analysed = []
+    for word, doc in zip(words_to_analyze, docs):
+        if doc:
+            token = doc[0]
+            spacy_cache[word] = {
+                'is_stop': token.is_stop,
+                'pos': token.pos_
+            }
+            if fold_lemmas:
+                spacy_cache[word]['lemma'] = token.lemma_.lower()
+            analysed.append(word)
+        if tag_cache is not None and len(analysed) >= batch_size:
+            tag_cache.add((w, spacy_cache[w]) for w in analysed)
+            analysed = []
+    if tag_cache is not None and analysed:
+        tag_cache.add((w, spacy_cache[w]) for w in analysed)
 
 def should_keep_word(word):
     """Determine if a word should be kept based on spaCy's analysis."""
@@ -102,6 +177,10 @@ def should_keep_word(word):
     if cleaned == 'ftse':
         print(f"spaCy analysis: is_stop={analysis['is_stop']}, pos={analysis['pos']}")
     
+    # When folding lemmas, procedural words are matched by lemma, so one form covers every inflection
+    if fold_lemmas and lemma_of(cleaned) in PARLIAMENTARY_PROCEDURAL_WORDS:
+        return False
+    
     # For verbs, check if the base form is in our exclusion list
     if analysis['pos'] == 'VERB':
         # Get the base form of the verb
@@ -128,49 +207,207 @@ def should_keep_word(word):
         
     return True
 
-try:
-    # Read the original JSON file
-    print("Reading JSON file...")
-    with open('combined_speaker_statistics.json', 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    # Collect all unique words first
-    print("Collecting unique words...")
+def lemma_of(word: str) -> str:
+    """The lemma a word is counted under when folding, or the cleaned word if spaCy gave none."""
+    cleaned = clean_word(word)
+    analysis = spacy_cache.get(cleaned) or spacy_cache.get(word)
+    lemma = clean_word(analysis.get('lemma', '')) if analysis else ''
+    return lemma or cleaned
+
+def collect_words(data: Dict) -> Set[str]:
+    """Return every distinct word used by any speaker."""
     all_words = set()
     for speaker_data in data.values():
         all_words.update(speaker_data.get("word_counts", {}).keys())
-    
-    # Pre-analyze all words in batches
-    print("Pre-analyzing words with spaCy...")
-    analyze_words_batch(list(all_words))
-    
-    # Process the data
-    print("Processing speakers...")
-    cleaned_data = {}
-    for speaker in tqdm(data.keys(), desc="Processing speakers"):
-        speaker_data = data[speaker]
-        # Copy the speaker's metadata
-        cleaned_data[speaker] = {
-            "person_id": speaker_data["person_id"],
-            "total_speeches": speaker_data["total_speeches"],
-            "word_counts": {}
-        }
-        
-        # Only clean the word_counts section
-        word_counts = speaker_data.get("word_counts", {})
-        cleaned_words = {
+    return all_words
+
+def collect_file_words(input_file: str) -> Tuple[Set[str], int]:
+    """Read a statistics file one speaker at a time, returning every distinct word and the number of speakers."""
+    all_words = set()
+    speakers = 0
+    for _, speaker_data in iter_speaker_records(input_file):
+        all_words.update(speaker_data.get("word_counts", {}).keys())
+        speakers += 1
+    return all_words, speakers
+
+def build_keep_set(words: Iterable[str]) -> Set[str]:
+    """Decide once per distinct word whether it is worth keeping, returning the words to keep."""
+    return {word for word in words if should_keep_word(word)}
+
+def keep_mask(words: List[str], n_process: int = 1) -> bytearray:
+    """The keep (1) or drop (0) decision for each of words, in order, for looking up by position.
+
+    Words spaCy has not analysed yet are tagged together first, in one batch.
+    """
+    analyze_words_batch(words, n_process=n_process)
+    return bytearray(should_keep_word(word) for word in words)
+
+def build_lemma_map(words: Iterable[str]) -> Dict[str, str]:
+    """Map each distinct word to the lemma it is counted under, looking each one up once."""
+    return {word: lemma_of(word) for word in words}
+
+def clean_speaker(speaker_data: Dict, keep_words: Set[str], lemmas: Optional[Dict[str, str]] = None) -> Dict:
+    """Return a speaker's statistics with only the words in keep_words, merged by lemma if lemmas are given."""
+    word_counts = speaker_data.get("word_counts", {})
+    if lemmas is None:
+        cleaned_counts = {
             word: count for word, count in word_counts.items()
-            if should_keep_word(word)
+            if word in keep_words
         }
-        cleaned_data[speaker]["word_counts"] = cleaned_words
+    else:
+        cleaned_counts = {}
+        for word, count in word_counts.items():
+            if word in keep_words:
+                lemma = lemmas[word]
+                cleaned_counts[lemma] = cleaned_counts.get(lemma, 0) + count
+    return {
+        "person_id": speaker_data["person_id"],
+        "total_speeches": speaker_data["total_speeches"],
+        "word_counts": cleaned_counts
+    }
+
+def sanitise_records(records: Iterable[SpeakerRecord], keep_words: Set[str],
+                     metrics: Optional[RunMetrics] = None, lemmas: Optional[Dict[str, str]] = None) -> Iterator[SpeakerRecord]:
+    """Yield each (speaker, data) record with only the words in keep_words, one speaker at a time.
+
+    With lemmas (from build_lemma_map), the counts of every form of a word are merged under its lemma.
+    """
+    for speaker, speaker_data in records:
+        cleaned = clean_speaker(speaker_data, keep_words, lemmas)
+        if metrics:
+            metrics.count('speakers')
+            metrics.count('words', len(speaker_data.get("word_counts", {})))
+            metrics.count('words_kept', len(cleaned["word_counts"]))
+        yield speaker, cleaned
+
+def sanitise_statistics(data: Dict, n_process: int = 1, lemmas: bool = False) -> Dict:
+    """Clean a whole {speaker: data} dict of speaker statistics and return the cleaned copy."""
+    set_lemma_mode(lemmas)
+    all_words = collect_words(data)
+    analyze_words_batch(list(all_words), n_process=n_process)
+    keep_words = build_keep_set(all_words)
+    return dict(sanitise_records(data.items(), keep_words, lemmas=build_lemma_map(keep_words) if lemmas else None))
+
+def sanitise_file(input_file: str, output_file: str, metrics: Optional[RunMetrics] = None,
+                  tag_cache_path: Optional[str] = TAG_CACHE_FILE, n_process: int = 1, stream: bool = False,
+                  lemmas: bool = False) -> int:
+    """Clean a speaker statistics file (.json, .ndjson or .msgpack) into output_file.
+
+    spaCy's analyses are loaded from and saved to the SQLite file tag_cache_path, unless it is None,
+    and new words are tagged in n_process processes. With stream, the file is read twice, one
+    speaker at a time (once for its vocabulary, then to filter and write each speaker), so only
+    the largest speaker and the vocabulary are ever held in memory rather than the whole file.
+    With lemmas, every form of a word is counted under its lemma.
+    Returns the number of speakers written.
+    """
+    metrics = metrics or RunMetrics('sanitise_json')
+    set_lemma_mode(lemmas)
+    try:
+        return _sanitise_file(input_file, output_file, metrics, tag_cache_path, n_process, stream)
+    finally:
+        close_tag_cache()
+
+def _sanitise_file(input_file: str, output_file: str, metrics: RunMetrics, tag_cache_path: Optional[str],
+                   n_process: int, stream: bool) -> int:
 
-    # Save the cleaned data
-    print("Saving cleaned data...")
-    output_file = 'cleaned_speaker_statistics.json'
-    with open(output_file, 'w', encoding='utf-8') as file:
-        json.dump(cleaned_data, file, indent=2, ensure_ascii=False)
+    if stream:
+        if not is_streamed(input_file):
+            print(f"Warning: ijson is not installed, so {input_file} will still be read in full (pip install ijson)")
+        # First pass: only the vocabulary is kept, each speaker is dropped once its words are seen
+        print(f"Collecting unique words from {input_file}...")
+        with metrics.stage('collect_words'):
+            all_words, speakers = collect_file_words(input_file)
+        # Second pass, made as the cleaned speakers are written
+        records = iter_speaker_records(input_file)
+    else:
+        # Read the original statistics
+        print(f"Reading {input_file}...")
+        with metrics.stage('load'):
+            data = load_speaker_statistics(input_file)
+
+        # Collect all unique words first
+        print("Collecting unique words...")
+        with metrics.stage('collect_words'):
+            all_words = collect_words(data)
+        records = data.items()
+        speakers = len(data)
+    metrics.count('distinct_words', len(all_words))
+
+    if tag_cache_path:
+        with metrics.stage('load_tag_cache'):
+            loaded = open_tag_cache(tag_cache_path)
+        print(f"Loaded {loaded} saved word analyses from {tag_cache_path}")
+    new_words = [word for word in all_words if word not in spacy_cache]
+    metrics.count('words_tagged', len(new_words))
+    metrics.record_cache('tag_cache', len(all_words) - len(new_words), len(new_words))
+
+    # Pre-analyze the words that have not been analysed before, in batches
+    if new_words:
+        with metrics.stage('load_model'):
+            get_nlp()
+        print(f"Pre-analyzing {len(new_words)} new words with spaCy...")
+        with metrics.stage('spacy_analysis'):
+            analyze_words_batch(new_words, n_process=n_process)
+        metrics.record_rate('words_tagged_per_second', 'words_tagged', 'spacy_analysis')
     
-    print(f"Successfully cleaned the JSON data. Output saved to {output_file}")
+    # Judge each distinct word once, so filtering is only a set lookup per speaker's word
+    print("Deciding which words to keep...")
+    with metrics.stage('decide_words'):
+        keep_words = build_keep_set(all_words)
+    metrics.count('distinct_words_kept', len(keep_words))
+
+    lemmas = None
+    if fold_lemmas:
+        # Each kept word is looked up once, and its counts then go to its lemma for every speaker
+        with metrics.stage('fold_lemmas'):
+            lemmas = build_lemma_map(keep_words)
+        metrics.count('distinct_lemmas', len(set(lemmas.values())))
+        print(f"Folding {len(keep_words)} words into {len(set(lemmas.values()))} lemmas")
+
+    # Process the data, writing each cleaned speaker straight out rather than building a second copy
+    print("Processing speakers and saving cleaned data...")
+    # Filtering happens as the records are written, so the two are timed together
+    with metrics.stage('filter_and_save'):
+        records = tqdm(records, total=speakers, desc="Processing speakers")
+        written = write_speaker_records(output_file, sanitise_records(records, keep_words, metrics, lemmas))
+    metrics.record_rate('words_per_second', 'words', 'filter_and_save')
     
-except Exception as e:
-    print(f"An error occurred: {str(e)}") 
\ No newline at end of file
+    print(f"Successfully cleaned the JSON data. Output saved to {output_file}")
+    return written
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Remove stop words, procedural words, numbers and unwanted parts of speech from speaker statistics.")
+    arg_parser.add_argument('input', nargs='?', default='combined_speaker_statistics.json',
+                            help="Speaker statistics to clean (.json, .ndjson or .msgpack)")
+    arg_parser.add_argument('output', nargs='?', default='cleaned_speaker_statistics.json',
+                            help="File to save the cleaned statistics to (.json, .ndjson or .msgpack)")
+    arg_parser.add_argument('--tag-cache', default=TAG_CACHE_FILE,
+                            help="SQLite file spaCy's word analyses are kept in between runs")
+    arg_parser.add_argument('--no-tag-cache', action='store_true',
+                            help="Analyse every word with spaCy instead of using the saved analyses")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="Read the input one speaker at a time, in two passes, instead of loading it all into memory")
+    arg_parser.add_argument('--lemmas', action='store_true',
+                            help="Count every form of a word under its lemma (e.g. 'votes' and 'voted' as 'vote')")
+    arg_parser.add_argument('--db',
+                            help="Also save the cleaned statistics in this SQLite database (see Shared_Utils/parliament_db.py)")
+    arg_parser.add_argument('--processes', type=int, default=1,
+                            help="Number of processes spaCy tags new words in (default: 1)")
+    args = arg_parser.parse_args()
+
+    metrics = RunMetrics.from_env('sanitise_json')
+    try:
+        sanitise_file(args.input, args.output, metrics, None if args.no_tag_cache else args.tag_cache,
+                      args.processes, args.stream, args.lemmas)
+        if args.db:
+            # Read back from the output one speaker at a time, so the cleaned statistics are never all in memory
+            with metrics.stage('save_db'), ParliamentDB(args.db) as db:
+                db.write_speaker_records(CLEANED_DATASET, iter_speaker_records(args.output))
+            print(f"Cleaned statistics saved to {args.db}")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return
+    metrics.save()
+
+if __name__ == "__main__":
+    main()
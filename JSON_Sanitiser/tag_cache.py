@@ -0,0 +1,61 @@
+import os
+import sqlite3
+from typing import Dict, Iterable
+
+class TagCache:
+    """On-disk cache of spaCy's analysis of single words: word -> {'is_stop', 'pos'} and, if made, 'lemma'.
+
+    Entries are stored in SQLite under a model key naming the spaCy and model versions, so
+    upgrading either starts a fresh set of entries rather than reusing stale tags. Only
+    entries that are not already stored are ever written.
+
+    Several processes can share one cache: writers wait up to `timeout` seconds for each other,
+    and readers never block them.
+    """
+
+    def __init__(self, path: str, model_key: str, timeout: float = 60):
+        self.path = path
+        self.model_key = model_key
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS word_tags ("
+            " model TEXT NOT NULL, word TEXT NOT NULL, is_stop INTEGER NOT NULL, pos TEXT NOT NULL,"
+            " lemma TEXT, PRIMARY KEY (model, word)) WITHOUT ROWID"
+        )
+        # Caches written before lemmas were stored have no lemma column yet
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(word_tags)")]
+        if 'lemma' not in columns:
+            self.connection.execute("ALTER TABLE word_tags ADD COLUMN lemma TEXT")
+        self.connection.commit()
+
+    def load(self) -> Dict[str, Dict]:
+        """Return every cached analysis made with this model."""
+        rows = self.connection.execute("SELECT word, is_stop, pos, lemma FROM word_tags WHERE model = ?", (self.model_key,))
+        analyses = {}
+        for word, is_stop, pos, lemma in rows:
+            analyses[word] = {'is_stop': bool(is_stop), 'pos': pos}
+            if lemma is not None:
+                analyses[word]['lemma'] = lemma
+        return analyses
+
+    def add(self, analyses: Iterable[tuple]):
+        """Store (word, {'is_stop', 'pos'[, 'lemma']}) pairs, ignoring words that are already cached.
+
+        If the cache stays locked by another process, the analyses are not saved and will simply be
+        made again next time, rather than failing the caller.
+        """
+        rows = [(self.model_key, word, int(analysis['is_stop']), analysis['pos'], analysis.get('lemma'))
+                for word, analysis in analyses]
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO word_tags (model, word, is_stop, pos, lemma) VALUES (?, ?, ?, ?, ?)", rows)
+        except sqlite3.OperationalError as e:
+            print(f"Warning: could not save {len(rows)} word analyses to {self.path}: {e}")
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,158 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import iter_speaker_records
+
+def build_word_index(statistics: Union[Dict, Iterable[Tuple[str, Dict]]], index_dir: str = 'word_index'):
+    """Build an inverted index from word to (speaker, count) postings, most frequent speaker first.
+
+    The index is a directory of flat files that are memory-mapped at lookup time:
+    - speakers.json: [name, person_id] for every speaker, in posting order
+    - words.bin / word_offsets: every word (UTF-8, sorted) and where each one starts
+    - postings / posting_offsets: (speaker index, count) uint32 pairs for each word
+
+    `statistics` is either a {speaker: data} dict or a stream of (speaker, data) pairs.
+    """
+    speakers = []
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    records = statistics.items() if isinstance(statistics, dict) else statistics
+    for speaker_index, (speaker, speaker_data) in enumerate(records):
+        speakers.append([speaker, speaker_data.get('person_id')])
+        for word, count in speaker_data.get('word_counts', {}).items():
+            postings[word].append((speaker_index, count))
+
+    tmp_dir = f"{index_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    word_offsets = array('I', [0])
+    posting_offsets = array('I', [0])
+    posting_column = array('I')
+    with open(os.path.join(tmp_dir, 'words.bin'), 'wb') as words_file:
+        for word in sorted(postings, key=lambda w: w.encode('utf-8')):
+            encoded = word.encode('utf-8')
+            words_file.write(encoded)
+            word_offsets.append(word_offsets[-1] + len(encoded))
+
+            for speaker_index, count in sorted(postings[word], key=lambda p: (-p[1], p[0])):
+                posting_column.append(speaker_index)
+                posting_column.append(count)
+            posting_offsets.append(len(posting_column) // 2)
+
+    for name, values in [('word_offsets', word_offsets), ('posting_offsets', posting_offsets), ('postings', posting_column)]:
+        with open(os.path.join(tmp_dir, name), 'wb') as f:
+            values.tofile(f)
+    with open(os.path.join(tmp_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'byteorder': sys.byteorder, 'words': len(postings), 'speakers': speakers}, f, ensure_ascii=False)
+
+    if os.path.exists(index_dir):
+        shutil.rmtree(index_dir)
+    os.replace(tmp_dir, index_dir)
+    return len(postings), len(speakers)
+
+class WordIndex:
+    """Memory-mapped view of an index written by build_word_index."""
+
+    def __init__(self, index_dir: str = 'word_index'):
+        with open(os.path.join(index_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.speakers: List[List[str]] = meta['speakers']
+        self.word_count = meta['words']
+        self._files = []
+        self.words = self._map(os.path.join(index_dir, 'words.bin'))
+        swap = meta['byteorder'] != sys.byteorder
+        self.word_offsets = self._map_uint32(os.path.join(index_dir, 'word_offsets'), swap)
+        self.posting_offsets = self._map_uint32(os.path.join(index_dir, 'posting_offsets'), swap)
+        self.postings = self._map_uint32(os.path.join(index_dir, 'postings'), swap)
+
+    def _map(self, path: str):
+        f = open(path, 'rb')
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _map_uint32(self, path: str, swap: bool):
+        data = self._map(path)
+        if swap:
+            # Index built on a machine with the other byte order, so fall back to a copy
+            values = array('I')
+            values.frombytes(data)
+            values.byteswap()
+            return values
+        return memoryview(data).cast('I') if data else array('I')
+
+    def _word(self, i: int) -> bytes:
+        return self.words[self.word_offsets[i]:self.word_offsets[i + 1]]
+
+    def find(self, word: str) -> Optional[int]:
+        """Binary search the sorted words for a word's position."""
+        target = word.encode('utf-8')
+        lo, hi = 0, self.word_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.word_count and self._word(lo) == target:
+            return lo
+        return None
+
+    def top_speakers(self, word: str, k: int = 10) -> List[Tuple[str, str, int]]:
+        """Return the (name, person_id, count) of the k speakers who used a word most."""
+        i = self.find(word)
+        if i is None:
+            return []
+        start = self.posting_offsets[i]
+        end = min(self.posting_offsets[i + 1], start + k)
+        results = []
+        for p in range(start, end):
+            name, person_id = self.speakers[self.postings[2 * p]]
+            results.append((name, person_id, self.postings[2 * p + 1]))
+        return results
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build or query an inverted index from word to speakers.")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build the index from a speaker statistics JSON file")
+    build_parser.add_argument('--input', default='cleaned_speaker_statistics.json',
+                              help="Speaker statistics to index (.json, .ndjson or .msgpack)")
+    build_parser.add_argument('--index', default='word_index', help="Directory to write the index to")
+
+    lookup_parser = subparsers.add_parser('lookup', help="Show the speakers who used words most")
+    lookup_parser.add_argument('words', nargs='+', help="Words to look up")
+    lookup_parser.add_argument('--index', default='word_index', help="Index directory")
+    lookup_parser.add_argument('--top', type=int, default=10, help="Number of speakers to show per word")
+
+    args = arg_parser.parse_args()
+
+    if args.command == 'build':
+        print(f"Building word index from {args.input}...")
+        word_count, speaker_count = build_word_index(iter_speaker_records(args.input), args.index)
+        print(f"Indexed {word_count} words for {speaker_count} speakers in {args.index}")
+        return
+
+    start = time.perf_counter()
+    index = WordIndex(args.index)
+    for word in args.words:
+        results = index.top_speakers(word.lower(), args.top)
+        print(f"\n{word}:")
+        if not results:
+            print("  No speakers found")
+        for name, person_id, count in results:
+            print(f"  {name} ({person_id}): {count}")
+    print(f"\nLookup took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
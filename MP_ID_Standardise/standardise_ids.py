@@ -1,49 +1,66 @@
+import argparse
 import json
-from typing import Dict, List
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import difflib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import iter_speaker_records
+from metrics import RunMetrics
+from parliament_db import RAW_DATASET, ParliamentDB
+
+# The MP data saved by mp_data_fetcher.py whose person_ids are standardised
+MPS_DATA_FILE = 'mps_data_20250307_093055.json'
+
 def load_json_file(filename: str) -> Dict:
     with open(filename, 'r') as f:
         return json.load(f)
 
+def load_speaker_ids(filename: str) -> Dict:
+    """Stream a speaker statistics file (.json, .ndjson or .msgpack), keeping only each speaker's person_id."""
+    return {
+        speaker_name: {'person_id': speaker_data.get('person_id')}
+        for speaker_name, speaker_data in iter_speaker_records(filename)
+    }
+
 def save_json_file(data: Dict, filename: str):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=4)
 
+# Special case mappings
+SPECIAL_CASES = {
+    "Tanmanjeet Singh Dhesi": "Tan Dhesi",
+    "Mr Tanmanjeet Singh Dhesi": "Tan Dhesi",
+    "Steff Aquarone": "Steffan Aquarone",
+    "Jess Asato": "Jessica Asato",
+    "Chris Bloore": "Christopher Bloore",
+    "Jess Brown-Fuller": "Jessica Brown-Fuller",
+    "Al Carns": "Alistair Carns",
+    "Jen Craft": "Jennifer Craft",
+    "Ed Davey": "Edward Davey",
+    "Mary Kelly Foy": "Mary Foy",
+    "Jon Pearce": "Jonathan Pearce"
+}
+
+TITLES = ['Ms', 'Mrs', 'Mr', 'Dr', 'Sir', 'Dame', 'Lady']
+
+# MPs sent to each process at a time when fuzzy matching in parallel
+FUZZY_CHUNK_SIZE = 100
+
+def clean_name(name: str) -> str:
+    """Remove all titles from a name and convert it to lowercase for comparison."""
+    clean = name
+    for title in TITLES:
+        clean = clean.replace(f"{title} ", "").strip()
+    return clean.lower()
+
 def get_name_similarity(name1: str, name2: str) -> float:
-    # Special case mappings
-    special_cases = {
-        "Tanmanjeet Singh Dhesi": "Tan Dhesi",
-        "Mr Tanmanjeet Singh Dhesi": "Tan Dhesi",
-        "Steff Aquarone": "Steffan Aquarone",
-        "Jess Asato": "Jessica Asato",
-        "Chris Bloore": "Christopher Bloore",
-        "Jess Brown-Fuller": "Jessica Brown-Fuller",
-        "Al Carns": "Alistair Carns",
-        "Jen Craft": "Jennifer Craft",
-        "Ed Davey": "Edward Davey",
-        "Mary Kelly Foy": "Mary Foy",
-        "Jon Pearce": "Jonathan Pearce"
-    }
-    
     # Apply special case mapping if exists
-    if name1 in special_cases:
-        name1 = special_cases[name1]
-    if name2 in special_cases:
-        name2 = special_cases[name2]
-    
-    # Remove all titles and clean names
-    titles = ['Ms', 'Mrs', 'Mr', 'Dr', 'Sir', 'Dame', 'Lady']
-    clean_name1 = name1
-    clean_name2 = name2
-    
-    for title in titles:
-        clean_name1 = clean_name1.replace(f"{title} ", "").strip()
-        clean_name2 = clean_name2.replace(f"{title} ", "").strip()
-    
-    # Convert to lowercase for comparison
-    clean_name1 = clean_name1.lower()
-    clean_name2 = clean_name2.lower()
+    clean_name1 = clean_name(SPECIAL_CASES.get(name1, name1))
+    clean_name2 = clean_name(SPECIAL_CASES.get(name2, name2))
     
     # If exact match after cleaning, return 1.0
     if clean_name1 == clean_name2:
@@ -66,64 +83,81 @@ def get_name_similarity(name1: str, name2: str) -> float:
     # Calculate similarity for remaining cases
     return difflib.SequenceMatcher(None, clean_name1, clean_name2).ratio()
 
-def match_mps(mps_data: List[Dict], speaker_stats: Dict, similarity_threshold: float = 0.75) -> Dict:
+def best_fuzzy_matches(candidates: List[Tuple[str, str, Optional[str]]], clean_mp_names: List[str],
+                       similarity_threshold: float) -> List[Optional[Tuple[str, Optional[str], float]]]:
+    """Find the speaker most similar to each MP among candidates sharing their first name.
+
+    candidates are (speaker_name, clean_name, person_id) in the speakers' original order. Each
+    MP gets (speaker_name, person_id, similarity) for the most similar candidate at or above
+    similarity_threshold, the last one in that order on a tie, or None.
+
+    difflib's ratio is only worked out for candidates that could beat the best so far: the
+    lengths of two names and the letters they share give an upper bound on it, so candidates
+    are tried from the highest bound down and the rest are skipped once no bound is high enough.
+    """
+    # The speaker's name is seq2, which difflib indexes once and reuses for every MP
+    matchers = [difflib.SequenceMatcher(None, '', clean_speaker_name) for _, clean_speaker_name, _ in candidates]
+    matches = []
+    for clean_mp_name in clean_mp_names:
+        bounds = []
+        for position, matcher in enumerate(matchers):
+            matcher.set_seq1(clean_mp_name)
+            if matcher.real_quick_ratio() >= similarity_threshold:
+                bound = matcher.quick_ratio()
+                if bound >= similarity_threshold:
+                    bounds.append((bound, position))
+        bounds.sort(reverse=True)
+
+        best_position = None
+        best_similarity = similarity_threshold
+        for bound, position in bounds:
+            if bound < best_similarity:
+                break
+            matcher = matchers[position]
+            matcher.set_seq1(clean_mp_name)
+            similarity = matcher.ratio()
+            if similarity > best_similarity or (similarity == best_similarity and
+                                                (best_position is None or position > best_position)):
+                best_similarity = similarity
+                best_position = position
+
+        if best_position is None:
+            matches.append(None)
+        else:
+            speaker_name, _, person_id = candidates[best_position]
+            matches.append((speaker_name, person_id, best_similarity))
+    return matches
+
+def _best_fuzzy_matches_task(task: Tuple) -> List[Optional[Tuple[str, Optional[str], float]]]:
+    return best_fuzzy_matches(*task)
+
+def match_mps(mps_data: List[Dict], speaker_stats: Dict, similarity_threshold: float = 0.75,
+              processes: int = 1) -> Dict:
+    """Map each MP's person_id to the person_id of the Hansard speaker with the same or the most similar name.
+
+    Exact matches are a lookup of the cleaned name, and fuzzy matches only compare speakers that
+    share the MP's first name, so the speakers are never compared with every MP. With processes,
+    MPs are fuzzy matched in that many processes.
+    """
     # Create a mapping of old person_ids to new ones
     id_mapping = {}
     unmatched_mps = []
     needs_review = []  # Store matches below 0.85 for review
     
-    # Create cleaned name mappings to avoid repeated cleaning
-    cleaned_mp_names = {}
-    cleaned_speaker_names = {}
-    mp_id_by_clean_name = {}  # Store MP IDs by cleaned name for exact matching
-    speaker_id_by_clean_name = {}  # Store speaker IDs by cleaned name for exact matching
-    
-    # Clean all names once and store mappings
-    titles = ['Ms', 'Mrs', 'Mr', 'Dr', 'Sir', 'Dame', 'Lady']
-    
-    def clean_name(name: str) -> str:
-        clean = name
-        for title in titles:
-            clean = clean.replace(f"{title} ", "").strip()
-        return clean.lower()
-    
-    # Special case mappings
-    special_cases = {
-        "Tanmanjeet Singh Dhesi": "Tan Dhesi",
-        "Mr Tanmanjeet Singh Dhesi": "Tan Dhesi",
-        "Steff Aquarone": "Steffan Aquarone",
-        "Jess Asato": "Jessica Asato",
-        "Chris Bloore": "Christopher Bloore",
-        "Jess Brown-Fuller": "Jessica Brown-Fuller",
-        "Al Carns": "Alistair Carns",
-        "Jen Craft": "Jennifer Craft",
-        "Ed Davey": "Edward Davey",
-        "Mary Kelly Foy": "Mary Foy",
-        "Jon Pearce": "Jonathan Pearce"
-    }
-    
     # Clean and store MP names
     print("\nProcessing MP names...")
-    for mp in mps_data:
-        original_name = mp['name']
-        # Apply special case mapping if exists
-        if original_name in special_cases:
-            original_name = special_cases[original_name]
-            
-        clean_name_val = clean_name(original_name)
-        cleaned_mp_names[mp['name']] = clean_name_val
-        mp_id_by_clean_name[clean_name_val] = mp['person_id']
+    cleaned_mp_names = {mp['name']: clean_name(SPECIAL_CASES.get(mp['name'], mp['name'])) for mp in mps_data}
     
-    # Clean and store speaker names
+    # Clean and store speaker names, in their original order
     print("\nProcessing speaker names...")
+    speakers = []
+    speaker_by_clean_name = {}  # The first speaker with each cleaned name, for exact matching
     for speaker_name, speaker_data in speaker_stats.items():
         # Apply special case mapping if exists
-        if speaker_name in special_cases:
-            speaker_name = special_cases[speaker_name]
-            
-        clean_name_val = clean_name(speaker_name)
-        cleaned_speaker_names[speaker_name] = clean_name_val
-        speaker_id_by_clean_name[clean_name_val] = speaker_data.get('person_id')
+        speaker_name = SPECIAL_CASES.get(speaker_name, speaker_name)
+        speaker = (speaker_name, clean_name(speaker_name), speaker_data.get('person_id'))
+        speakers.append(speaker)
+        speaker_by_clean_name.setdefault(speaker[1], speaker)
     
     # Track which names have been matched
     matched_mp_names = set()
@@ -132,69 +166,59 @@ def match_mps(mps_data: List[Dict], speaker_stats: Dict, similarity_threshold: f
     # First pass: Find exact matches using cleaned names
     print("\nFinding exact matches...")
     for mp in mps_data:
-        mp_name = mp['name']
-        if mp_name in special_cases:
-            mp_name = special_cases[mp_name]
-        clean_mp_name = cleaned_mp_names[mp['name']]
-        
-        # Look for exact matches in speaker names
-        for speaker_name, speaker_data in speaker_stats.items():
-            if speaker_name in special_cases:
-                speaker_name = special_cases[speaker_name]
-            clean_speaker_name = cleaned_speaker_names[speaker_name]
-            
-            if clean_mp_name == clean_speaker_name:
-                id_mapping[mp['person_id']] = speaker_data.get('person_id')
-                matched_mp_names.add(mp_name)
-                matched_speaker_names.add(speaker_name)
-                print(f"Exact match found: {mp_name} -> {speaker_name}")
-                break
+        mp_name = SPECIAL_CASES.get(mp['name'], mp['name'])
+        speaker = speaker_by_clean_name.get(cleaned_mp_names[mp['name']])
+        if speaker:
+            speaker_name, _, new_id = speaker
+            id_mapping[mp['person_id']] = new_id
+            matched_mp_names.add(mp_name)
+            matched_speaker_names.add(speaker_name)
+            print(f"Exact match found: {mp_name} -> {speaker_name}")
     
     # Second pass: Only try fuzzy matching for names that didn't have exact matches
     print("\nAttempting fuzzy matches for remaining names...")
-    for mp in mps_data:
-        mp_name = mp['name']
-        if mp_name in special_cases:
-            mp_name = special_cases[mp_name]
-            
-        # Skip if we already found an exact match
-        if mp_name in matched_mp_names:
-            continue
-            
-        matched = False
-        best_match = None
-        best_similarity = similarity_threshold
-        
-        for speaker_name, speaker_data in speaker_stats.items():
-            if speaker_name in special_cases:
-                speaker_name = special_cases[speaker_name]
-                
-            # Skip if this speaker name was exactly matched to someone else
-            if speaker_name in matched_speaker_names:
-                continue
-                
-            # Calculate similarity
-            clean_mp_name = cleaned_mp_names[mp['name']]
-            clean_speaker_name = cleaned_speaker_names[speaker_name]
-            
-            # Split names into parts for comparison
-            mp_parts = clean_mp_name.split()
-            speaker_parts = clean_speaker_name.split()
-            
-            # Only proceed if first names match
-            if len(mp_parts) > 0 and len(speaker_parts) > 0 and mp_parts[0] == speaker_parts[0]:
-                similarity = difflib.SequenceMatcher(None, clean_mp_name, clean_speaker_name).ratio()
-                
-                # Update best match if this is better
-                if similarity >= best_similarity:
-                    best_similarity = similarity
-                    best_match = (speaker_name, speaker_data.get('person_id'), similarity)
+    # Speakers not exactly matched to someone else, blocked by first name
+    candidates_by_first_name = defaultdict(list)
+    for speaker in speakers:
+        if speaker[0] not in matched_speaker_names and speaker[1].split():
+            candidates_by_first_name[speaker[1].split()[0]].append(speaker)
+    
+    # MPs without an exact match, grouped the same way
+    remaining_mps = [mp for mp in mps_data if SPECIAL_CASES.get(mp['name'], mp['name']) not in matched_mp_names]
+    mps_by_first_name = defaultdict(list)
+    for position, mp in enumerate(remaining_mps):
+        parts = cleaned_mp_names[mp['name']].split()
+        if parts and parts[0] in candidates_by_first_name:
+            mps_by_first_name[parts[0]].append(position)
+    
+    tasks = []
+    task_mps = []
+    for first_name, block_mps in mps_by_first_name.items():
+        for i in range(0, len(block_mps), FUZZY_CHUNK_SIZE):
+            chunk = block_mps[i:i + FUZZY_CHUNK_SIZE]
+            tasks.append((candidates_by_first_name[first_name], [cleaned_mp_names[remaining_mps[position]['name']]
+                                                                 for position in chunk],
+                          similarity_threshold))
+            task_mps.append(chunk)
+    
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_best_fuzzy_matches_task, tasks))
+    else:
+        results = [best_fuzzy_matches(*task) for task in tasks]
+    
+    best_matches = [None] * len(remaining_mps)
+    for chunk, matches in zip(task_mps, results):
+        for position, match in zip(chunk, matches):
+            best_matches[position] = match
+    
+    for mp, best_match in zip(remaining_mps, best_matches):
+        mp_name = SPECIAL_CASES.get(mp['name'], mp['name'])
         
         # If we found a fuzzy match, use it
         if best_match:
             speaker_name, new_id, similarity = best_match
             id_mapping[mp['person_id']] = new_id
-            matched = True
             if similarity < 0.85:
                 needs_review.append({
                     'mp_name': mp_name,
@@ -203,8 +227,7 @@ def match_mps(mps_data: List[Dict], speaker_stats: Dict, similarity_threshold: f
                     'old_id': mp['person_id'],
                     'new_id': new_id
                 })
-        
-        if not matched:
+        else:
             unmatched_mps.append(mp_name)
     
     # Print matches that need review
@@ -219,28 +242,53 @@ def match_mps(mps_data: List[Dict], speaker_stats: Dict, similarity_threshold: f
     # Print unmatched MPs for review
     if unmatched_mps:
         print("\nWarning: The following MPs could not be matched:")
+        ids_by_name = defaultdict(list)
+        for mp in mps_data:
+            ids_by_name[mp['name']].append(mp['person_id'])
         for name in unmatched_mps:
             print(f"- {name}")
             # Also print their current ID for reference
-            for mp in mps_data:
-                if mp['name'] == name:
-                    print(f"  Current ID: {mp['person_id']}")
+            for person_id in ids_by_name.get(name, []):
+                print(f"  Current ID: {person_id}")
     
     return id_mapping
 
 def main():
+    arg_parser = argparse.ArgumentParser(description="Match MPs to Hansard speakers and standardise their person IDs.")
+    arg_parser.add_argument('speaker_file', nargs='?', default='combined_speaker_statistics.json',
+                            help="Speaker statistics to match against (.json, .ndjson or .msgpack)")
+    arg_parser.add_argument('--db', help="Read MPs and speakers from this SQLite database and save the matched IDs to it, "
+                                         "instead of using the JSON files")
+    arg_parser.add_argument('--dataset', default=RAW_DATASET, help="Speaker statistics in the database to match against")
+    arg_parser.add_argument('--processes', type=int, default=1,
+                            help="Number of processes to fuzzy match MPs in (default 1)")
+    args = arg_parser.parse_args()
+
+    metrics = RunMetrics.from_env('standardise_ids')
+    db = ParliamentDB(args.db) if args.db else None
+
     # Load the data files
     print("Loading data files...")
-    mps_data = load_json_file('mps_data_20250307_093055.json')
-    speaker_stats = load_json_file('combined_speaker_statistics.json')
+    with metrics.stage('load'):
+        if db:
+            # Matched against the IDs as fetched, so re-running replaces earlier matches
+            mps_data = db.members(standardised=False)
+            speaker_stats = db.speaker_ids(args.dataset)
+        else:
+            mps_data = load_json_file(MPS_DATA_FILE)
+            # Matching only needs names and IDs, so the word counts are dropped as the file is read
+            speaker_stats = load_speaker_ids(args.speaker_file)
     
     # Match MPs and create ID mapping
     print("Matching MPs between files...")
-    id_mapping = match_mps(mps_data, speaker_stats)
+    with metrics.stage('match'):
+        id_mapping = match_mps(mps_data, speaker_stats, processes=args.processes)
     
-    # Create a backup of the original file
-    print("Creating backup of original MPs data...")
-    save_json_file(mps_data, 'mps_data_20250307_093055.backup.json')
+    # Create a backup of the original file (the database keeps the original IDs itself)
+    if not db:
+        print("Creating backup of original MPs data...")
+        with metrics.stage('save'):
+            save_json_file(mps_data, f"{os.path.splitext(MPS_DATA_FILE)[0]}.backup.json")
     
     # Update person_ids in mps_data
     print("Updating person IDs...")
@@ -254,7 +302,12 @@ def main():
     
     # Save the updated data
     print("Saving updated data...")
-    save_json_file(mps_data, 'mps_data_20250307_093055.json')
+    with metrics.stage('save'):
+        if db:
+            db.upsert_id_mappings(id_mapping)
+            db.close()
+        else:
+            save_json_file(mps_data, MPS_DATA_FILE)
     
     # Print summary
     print(f"\nSummary:")
@@ -266,5 +319,12 @@ def main():
         print("\nNote: Some MPs could not be matched. Check the warnings above for details.")
         print("You may want to adjust the similarity threshold or manually review these cases.")
 
+    metrics.count('mps', len(mps_data))
+    metrics.count('speakers', len(speaker_stats))
+    metrics.count('mps_matched', len(id_mapping))
+    metrics.count('ids_updated', updated_count)
+    metrics.record_rate('mps_per_second', 'mps', 'match')
+    metrics.save()
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
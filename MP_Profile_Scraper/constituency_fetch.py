@@ -1,21 +1,30 @@
 import requests
+import argparse
 import json
+import os
+import sys
 from datetime import datetime
-import time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from http_client import HTTPClient
+from metrics import RunMetrics
+from parliament_db import PERSON_ID_PREFIX, ParliamentDB
+
+client = HTTPClient()
+metrics = RunMetrics.from_env('constituency_fetch')
 
 def fetch_constituency(constituency_id):
     """Fetch constituency information using the constituency ID."""
     url = f"https://members-api.parliament.uk/api/Location/Constituency/{constituency_id}"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = client.get_json(url)
         return data.get('value', {}).get('name', '')
     except Exception as e:
         print(f"Error fetching constituency {constituency_id}: {e}")
         return ''
 
-def fetch_mps_constituencies():
+def fetch_mps_constituencies(db_path: Optional[str] = None):
     # Base URL for the UK Parliament API
     base_url = "https://members-api.parliament.uk/api/Members/Search"
     
@@ -29,14 +38,16 @@ def fetch_mps_constituencies():
     
     try:
         # Make the API request
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        
-        # Parse the JSON response
-        data = response.json()
+        with metrics.stage('fetch'):
+            response = client.get(base_url, params=params)
+            response.raise_for_status()  # Raise an exception for bad status codes
+            
+            # Parse the JSON response
+            data = response.json()
         
         # Extract MPs data
         mps_data = []
+        db_members = []
         for mp in data.get('items', []):
             value = mp.get('value', {})
             latest_membership = value.get('latestHouseMembership', {})
@@ -50,20 +61,25 @@ def fetch_mps_constituencies():
                 "portrait_URL": f"https://members-api.parliament.uk/api/members/{value.get('id', '')}/Portrait?cropType=ThreeFour"
             }
             mps_data.append(mp_info)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.1)
+            if value.get('id') not in (None, ''):
+                db_members.append({**mp_info, 'member_id': value['id'], 'person_id': f"{PERSON_ID_PREFIX}{value['id']}"})
         
         # Generate filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"mps_data_{timestamp}.json"
         
         # Save to JSON file
-        with open(filename, 'w', encoding='utf-8') as f:
+        with metrics.stage('save'), open(filename, 'w', encoding='utf-8') as f:
             json.dump(mps_data, f, indent=4, ensure_ascii=False)
             
+        metrics.count('mps', len(mps_data))
         print(f"Successfully fetched data for {len(mps_data)} MPs")
         print(f"Data saved to {filename}")
+
+        if db_path:
+            with metrics.stage('save_db'), ParliamentDB(db_path) as db:
+                db.upsert_members(db_members)
+            print(f"MPs updated in {db_path}")
         
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data: {e}")
@@ -72,5 +88,10 @@ def fetch_mps_constituencies():
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
+    metrics.record_http(client)
+    metrics.save()
+
 if __name__ == "__main__":
-    fetch_mps_constituencies() 
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Fetch every current MP and their constituency from the Members API.")
+    arg_parser.add_argument('--db', help="Also add or update the MPs in this SQLite database (see Shared_Utils/parliament_db.py)")
+    fetch_mps_constituencies(arg_parser.parse_args().db) 
\ No newline at end of file
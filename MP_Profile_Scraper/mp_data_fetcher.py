@@ -1,7 +1,18 @@
 import requests
+import argparse
 import json
+import os
+import sys
 from datetime import datetime
-import time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from http_client import HTTPClient
+from metrics import RunMetrics
+from parliament_db import ParliamentDB
+
+client = HTTPClient()
+metrics = RunMetrics.from_env('mp_data_fetcher')
 
 def get_mp_constituency(mp_data):
     """Get constituency information from MP data"""
@@ -15,12 +26,14 @@ def get_mp_constituency(mp_data):
         print(f"Error whilst getting constituency from MP data: {e}")
         return None
 
-def fetch_mps():
+def fetch_mps(db_path: Optional[str] = None):
     # Base URL for the UK Parliament API
     base_url = "https://members-api.parliament.uk/api"
     
     # Initialise empty list to store MP data
     mps_data = []
+    # The same MPs with their Members API id, for the database
+    db_members = []
     
     # Parameters for the API request
     page_size = 20  # Number of MPs per page
@@ -38,9 +51,10 @@ def fetch_mps():
         }
         
         try:
-            response = requests.get(endpoint, params=params)
-            response.raise_for_status()
-            data = response.json()
+            with metrics.stage('fetch_page'):
+                response = client.get(endpoint, params=params)
+                response.raise_for_status()
+                data = response.json()
             
             # Get total count of MPs
             total_count = data.get("totalResults", 0)
@@ -62,6 +76,7 @@ def fetch_mps():
                         "portrait_URL": f"https://members-api.parliament.uk/api/members/{mp_id}/Portrait?cropType=ThreeFour"
                     }
                     mps_data.append(mp_info)
+                    db_members.append({**mp_info, 'member_id': mp_id})
                     total_processed += 1
                     print(f"Processed MP {total_processed}/{total_count}: {mp_info['name']} - {mp_info['constituency']}")
                     
@@ -76,9 +91,6 @@ def fetch_mps():
             # Move to next page
             skip += page_size
             
-            # Add a small delay to avoid overwhelming the API
-            time.sleep(1)
-            
         except requests.exceptions.RequestException as e:
             print(f"Error whilst fetching MP data: {e}")
             break
@@ -93,11 +105,23 @@ def fetch_mps():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"mps_data_{timestamp}.json"
     
-    with open(filename, 'w', encoding='utf-8') as f:
+    with metrics.stage('save'), open(filename, 'w', encoding='utf-8') as f:
         json.dump(mps_data, f, indent=4, ensure_ascii=False)
     
     print(f"Successfully fetched data for {len(mps_data)} MPs")
     print(f"Data saved to {filename}")
 
+    if db_path:
+        with metrics.stage('save_db'), ParliamentDB(db_path) as db:
+            db.upsert_members(db_members)
+        print(f"MPs updated in {db_path}")
+
+    metrics.count('mps', len(mps_data))
+    metrics.record_rate('mps_per_second', 'mps', 'fetch_page')
+    metrics.record_http(client)
+    metrics.save()
+
 if __name__ == "__main__":
-    fetch_mps() 
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Fetch every current MP from the Members API.")
+    arg_parser.add_argument('--db', help="Also add or update the MPs in this SQLite database (see Shared_Utils/parliament_db.py)")
+    fetch_mps(arg_parser.parse_args().db) 
\ No newline at end of file
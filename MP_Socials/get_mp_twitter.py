@@ -1,18 +1,30 @@
 import requests
+import argparse
 import json
-from typing import List, Dict
-import time
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from http_client import HTTPClient
+from metrics import RunMetrics
+from parliament_db import ParliamentDB
+
+# Number of MPs whose contact details are fetched at once
+CONTACT_WORKERS = 8
+
+client = HTTPClient(pool_size=CONTACT_WORKERS)
+metrics = RunMetrics.from_env('get_mp_twitter')
+
 def get_mp_contact_details(mp_id: int) -> str:
     """
     Get MP's contact details including Twitter handle using the Members API Contact endpoint.
     """
     url = f"https://members-api.parliament.uk/api/Members/{mp_id}/Contact"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = client.get_json(url)
         
         # Debug: Print first MP's contact data
         if mp_id == 172:  # Diane Abbott's ID
@@ -58,21 +70,21 @@ def get_all_mps() -> List[Dict]:
     while True:
         try:
             print(f"\rFetching MPs {total_fetched + 1}-{total_fetched + params['take']}...", end="")
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            with metrics.stage('fetch_page'):
+                response = client.get(base_url, params=params)
+                response.raise_for_status()
+                data = response.json()
             
             if not data.get('items'):
                 break
             
-            # Process each MP
-            for mp in data['items']:
-                mp_id = mp['value']['id']
-                twitter_handle = get_mp_contact_details(mp_id)
+            # Process each MP, fetching the page's contact details in parallel
+            with metrics.stage('fetch_contacts'), ThreadPoolExecutor(max_workers=CONTACT_WORKERS) as executor:
+                handles = list(executor.map(get_mp_contact_details, [mp['value']['id'] for mp in data['items']]))
+            for mp, twitter_handle in zip(data['items'], handles):
                 if twitter_handle:
                     print(f"\nFound Twitter handle for {mp['value']['nameDisplayAs']}: {twitter_handle}")
                 mp['twitter_handle'] = twitter_handle
-                time.sleep(0.1)  # Rate limiting
             
             all_mps.extend(data['items'])
             total_fetched += len(data['items'])
@@ -134,7 +146,7 @@ def save_to_json(data: List[Dict], filename: str = None):
     except Exception as e:
         print(f"Error saving data to file: {e}")
 
-def main():
+def main(db_path: Optional[str] = None):
     print("Starting MP Twitter handle collection...")
     mps_data = get_all_mps()
     
@@ -154,10 +166,24 @@ def main():
     print(f"Percentage with Twitter: {(mps_with_twitter/total_mps)*100:.1f}%")
     
     # Save the data
-    save_to_json(mp_twitter_info)
+    with metrics.stage('save'):
+        save_to_json(mp_twitter_info)
+    if db_path:
+        with metrics.stage('save_db'), ParliamentDB(db_path) as db:
+            db.upsert_handles((mp['value']['id'], mp['twitter_handle']) for mp in mps_data)
+        print(f"Twitter handles updated in {db_path}")
+
+    metrics.count('mps', total_mps)
+    metrics.count('mps_with_twitter', mps_with_twitter)
+    metrics.record_rate('mps_per_second', 'mps', 'fetch_contacts')
+    metrics.record_http(client)
+    metrics.save()
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Collect the X (Twitter) handles of every current MP.")
+    arg_parser.add_argument('--db', help="Also save the handles in this SQLite database (see Shared_Utils/parliament_db.py)")
+    args = arg_parser.parse_args()
     try:
-        main()
+        main(args.db)
     except KeyboardInterrupt:
         print("\nScript interrupted by user. Exiting...") 
\ No newline at end of file
@@ -1,6 +1,12 @@
+import argparse
 import json
+import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from parliament_db import ParliamentDB
+
 def load_json_file(filename):
     with open(filename, 'r', encoding='utf-8') as f:
         return json.load(f)
@@ -10,16 +16,28 @@ def save_json_file(data, filename):
         json.dump(data, f, indent=4, ensure_ascii=False)
 
 def main():
-    # Load both JSON files
-    mps_data = load_json_file('mps_data_20250307_093055.json')
-    twitter_data = load_json_file('mp_twitter_20250311_201554.json')
-
-    # Create a dictionary mapping names to Twitter handles
-    twitter_handles = {mp['name']: mp['twitter_handle'] for mp in twitter_data}
-
-    # Update MPs data with Twitter handles
-    for mp in mps_data:
-        mp['twitter_handle'] = twitter_handles.get(mp['name'])
+    arg_parser = argparse.ArgumentParser(description="Add each MP's Twitter handle to their MP data.")
+    arg_parser.add_argument('--mps-file', default='mps_data_20250307_093055.json', help="MP data to add the handles to")
+    arg_parser.add_argument('--twitter-file', default='mp_twitter_20250311_201554.json',
+                            help="Handles saved by get_mp_twitter.py")
+    arg_parser.add_argument('--db', help="Join the MPs and handles in this SQLite database instead of the JSON files")
+    args = arg_parser.parse_args()
+
+    if args.db:
+        # MPs and handles are joined on their Members API id, with the standardised person IDs
+        with ParliamentDB(args.db) as db:
+            mps_data = db.members(platform='twitter')
+    else:
+        # Load both JSON files
+        mps_data = load_json_file(args.mps_file)
+        twitter_data = load_json_file(args.twitter_file)
+
+        # Create a dictionary mapping names to Twitter handles
+        twitter_handles = {mp['name']: mp['twitter_handle'] for mp in twitter_data}
+
+        # Update MPs data with Twitter handles
+        for mp in mps_data:
+            mp['twitter_handle'] = twitter_handles.get(mp['name'])
 
     # Generate output filename with timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
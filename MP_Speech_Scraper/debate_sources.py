@@ -0,0 +1,141 @@
+import os
+import re
+import tarfile
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Callable, Iterable, List, Optional, Tuple
+from bs4 import BeautifulSoup
+
+# Matches debate file names and captures their sitting date, e.g. westminster2025-01-09a.xml
+DEBATE_FILE_PATTERN = re.compile(r'(?:debates|westminster)(\d{4}-\d{2}-\d{2})[a-z]?\.xml$')
+
+# The scrapedxml/ directories holding Commons and Westminster Hall debates
+DEBATE_DIRECTORIES = ('debates', 'westminhall')
+
+class DebateFileIndex:
+    """Debate files sorted by sitting date, so a date range is found with two binary searches."""
+
+    def __init__(self, debate_files: Iterable[Tuple[str, str]]):
+        entries = []
+        for location, filename in debate_files:
+            date_match = DEBATE_FILE_PATTERN.search(filename)
+            if date_match:
+                entries.append((date_match.group(1), location, filename))
+        entries.sort()
+        self.entries = entries
+        self.dates = [date for date, _, _ in entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """Return the (location, filename) of every file from start_date to end_date (YYYY-MM-DD, inclusive).
+
+        Files come back ordered by location then filename, the order they are analysed in.
+        """
+        lo = bisect_left(self.dates, start_date)
+        hi = bisect_right(self.dates, end_date)
+        return sorted((location, filename) for _, location, filename in self.entries[lo:hi])
+
+class HTTPSource:
+    """Debate files listed from and downloaded off the TheyWorkForYou pwdata directory indexes.
+
+    Directory indexes that could not be fetched are skipped, and recorded in `failed_locations`.
+    """
+
+    def __init__(self, base_urls: List[str], fetch_url: Callable[[str, Optional[float]], bytes],
+                 listing_ttl: float, file_ttl: float):
+        self.base_urls = base_urls
+        self.fetch_url = fetch_url
+        self.listing_ttl = listing_ttl
+        self.file_ttl = file_ttl
+        self.failed_locations: List[str] = []
+
+    def list_files(self) -> List[Tuple[str, str]]:
+        debate_files = []
+        self.failed_locations = []
+        for base_url in self.base_urls:
+            try:
+                soup = BeautifulSoup(self.fetch_url(base_url, self.listing_ttl), 'html.parser')
+                links = [link['href'] for link in soup.find_all('a', href=DEBATE_FILE_PATTERN)]
+                print(f"Found {len(links)} total debate files in {base_url}")
+                debate_files.extend((base_url, filename) for filename in links)
+            except Exception as e:
+                print(f"Error whilst accessing {base_url}: {str(e)}")
+                self.failed_locations.append(base_url)
+        return debate_files
+
+    def read(self, base_url: str, filename: str) -> bytes:
+        return self.fetch_url(f"{base_url}{filename}", self.file_ttl)
+
+class DirectorySource:
+    """Debate files read from a local mirror of pwdata's scrapedxml/ directory (e.g. kept with rsync).
+
+    Directories that could not be read are skipped, and recorded in `failed_locations`.
+    """
+
+    def __init__(self, root: str, directories: Tuple[str, ...] = DEBATE_DIRECTORIES):
+        self.root = root
+        self.directories = directories
+        self.failed_locations: List[str] = []
+
+    def list_files(self) -> List[Tuple[str, str]]:
+        debate_files = []
+        self.failed_locations = []
+        for directory in self.directories:
+            path = os.path.join(self.root, directory)
+            try:
+                filenames = [entry.name for entry in os.scandir(path)
+                             if entry.is_file() and DEBATE_FILE_PATTERN.search(entry.name)]
+                print(f"Found {len(filenames)} total debate files in {path}")
+                debate_files.extend((path, filename) for filename in filenames)
+            except OSError as e:
+                print(f"Error whilst accessing {path}: {str(e)}")
+                self.failed_locations.append(path)
+        return debate_files
+
+    def read(self, path: str, filename: str) -> bytes:
+        with open(os.path.join(path, filename), 'rb') as f:
+            return f.read()
+
+class TarballSource:
+    """Debate files read from a tarball of pwdata's scrapedxml/ directory.
+
+    Members are matched by their parent directory name, so any leading path inside the
+    archive is fine. Reads share one open archive and are serialised with a lock. An archive
+    that cannot be read raises, so `failed_locations` is always empty.
+    """
+
+    def __init__(self, tar_path: str, directories: Tuple[str, ...] = DEBATE_DIRECTORIES):
+        self.tar_path = tar_path
+        self.directories = directories
+        self.failed_locations: List[str] = []
+        self._tar = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes open their own handle on the archive
+        return {'tar_path': self.tar_path, 'directories': self.directories}
+
+    def __setstate__(self, state):
+        self.__init__(state['tar_path'], state['directories'])
+
+    def _open(self) -> tarfile.TarFile:
+        if self._tar is None:
+            self._tar = tarfile.open(self.tar_path)
+        return self._tar
+
+    def list_files(self) -> List[Tuple[str, str]]:
+        debate_files = []
+        with self._lock:
+            for member in self._open().getmembers():
+                location, _, filename = member.name.rpartition('/')
+                if (member.isfile() and location.rsplit('/', 1)[-1] in self.directories
+                        and DEBATE_FILE_PATTERN.search(filename)):
+                    debate_files.append((location, filename))
+        print(f"Found {len(debate_files)} total debate files in {self.tar_path}")
+        return debate_files
+
+    def read(self, location: str, filename: str) -> bytes:
+        with self._lock:
+            return self._open().extractfile(f"{location}/{filename}").read()
@@ -1,144 +1,1088 @@
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 from dateutil import parser
 import re
-from collections import defaultdict
+from collections import defaultdict, deque, Counter
+from array import array
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from tqdm import tqdm
 import os
-from typing import Dict, Set, List
+import sys
+import shutil
+from typing import Dict, Set, List, Optional, Iterable, Iterator, Tuple
+import argparse
 import json
+import gzip
+import hashlib
+from io import BytesIO
+from xml_cache import XMLCache
+from speech_parsers import PARSER_BACKENDS, DEFAULT_BACKEND
+from debate_sources import DebateFileIndex, HTTPSource, DirectorySource, TarballSource, DEBATE_FILE_PATTERN
+from word_buckets import BUCKET_KEY_LENGTHS, BucketStore, bucket_key, write_bucket_store
+from phrase_sketch import SpaceSaving, count_phrases
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Shared_Utils'))
+from speaker_stats_io import iter_speaker_records, write_speaker_records
+from http_client import HTTPClient
+from metrics import RunMetrics
+from parliament_db import CLEANED_DATASET, RAW_DATASET, ParliamentDB
+
+class Vocabulary:
+    """Interns every distinct word once and gives it a small integer id.
+
+    Words get ids in the order they are first seen. Only the main thread adds words, so
+    no locking is needed.
+    """
+    __slots__ = ('ids', 'words')
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word: str) -> int:
+        """Return the id of a word, assigning the next free id if it is new."""
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def remap(self, other: 'Vocabulary') -> List[int]:
+        """Add another vocabulary's words to this one, returning the new id of each of its ids."""
+        return [self.add(word) for word in other.words]
 
 class SpeakerStats:
+    """Word counts for one speaker, keyed by Vocabulary id.
+
+    Counts are kept in two parallel arrays in the order the speaker first used each word, which
+    take 8 bytes per word instead of a dict entry plus a private copy of the word. New counts collect in a `pending`
+    Counter and are folded into the arrays once it holds as many words as they do, so each
+    rebuild of the arrays is paid for by at least as many new words.
+    With phrase counting on, `phrases` holds a fixed-size SpaceSaving summary of the speaker's phrases.
+    """
+    __slots__ = ('word_ids', 'counts', 'pending', 'total_speeches', 'person_id', 'phrases')
+
     def __init__(self):
-        self.word_counts = defaultdict(int)
+        self.word_ids = array('I')
+        self.counts = array('I')
+        self.pending: Optional[Counter] = None
         self.total_speeches = 0
         self.person_id = None
+        self.phrases: Optional[SpaceSaving] = None
+
+    def add_counts(self, counts):
+        """Add a {word_id: count} mapping to this speaker's counts, or count every id of an iterable once.
+
+        Counting an iterable of ids, such as a speech's words, is done by Counter in C.
+        """
+        pending = self.pending
+        if pending is None:
+            pending = self.pending = Counter()
+        pending.update(counts)
+        if len(pending) > max(1024, len(self.word_ids)):
+            self._flush()
+
+    def _flush(self):
+        """Fold pending counts into the arrays, appending new words in the order they were first used."""
+        if not self.pending:
+            return
+        merged = dict(zip(self.word_ids, self.counts))
+        for word_id, count in self.pending.items():
+            merged[word_id] = merged.get(word_id, 0) + count
+        self.pending = None
+
+        self.word_ids = array('I', merged.keys())
+        self.counts = array('I', merged.values())
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Iterate over (word_id, count) pairs in the order the speaker first used each word."""
+        self._flush()
+        return zip(self.word_ids, self.counts)
+
+    def merge(self, other: 'SpeakerStats', id_map: Optional[List[int]] = None, include_phrases: bool = True):
+        """Add another partial table's statistics, as if its speeches came after this one's.
+
+        `id_map` translates the other table's word ids when it was built with a different Vocabulary.
+        """
+        if id_map is None:
+            self.add_counts(dict(other.items()))
+        else:
+            self.add_counts({id_map[word_id]: count for word_id, count in other.items()})
+        self.total_speeches += other.total_speeches
+        self.person_id = other.person_id
+        if include_phrases and other.phrases is not None:
+            if self.phrases is None:
+                self.phrases = other.phrases.copy()
+            else:
+                self.phrases.merge(other.phrases)
+
+    def keep_only(self, keep: bytearray):
+        """Drop the counts of every word whose id is not marked 1 in keep."""
+        kept = [(word_id, count) for word_id, count in self.items() if keep[word_id]]
+        self.word_ids = array('I', [word_id for word_id, _ in kept])
+        self.counts = array('I', [count for _, count in kept])
+
+    def subtract(self, other: 'SpeakerStats'):
+        """Remove a partial table's statistics that were previously merged in."""
+        removed = dict(other.items())
+        kept = [(word_id, count - removed.get(word_id, 0)) for word_id, count in self.items()]
+        kept = [(word_id, count) for word_id, count in kept if count > 0]
+        self.word_ids = array('I', [word_id for word_id, _ in kept])
+        self.counts = array('I', [count for _, count in kept])
+        # Stores written before bucket speech counts were saved load every bucket with none
+        self.total_speeches = max(0, self.total_speeches - other.total_speeches)
+
+def iter_speaker_table(table: Dict[str, SpeakerStats], vocab: Vocabulary,
+                       phrase_top: int = 50, keep: Optional[bytearray] = None) -> Iterator[Tuple[str, Dict]]:
+    """Yield each speaker's statistics in the plain dict layout used in speaker_statistics.json, one at a time.
+
+    With `keep`, only the words whose id is marked 1 in it are included.
+    """
+    words = vocab.words
+    for speaker, stats in table.items():
+        if keep is None:
+            word_counts = {words[word_id]: count for word_id, count in stats.items()}
+        else:
+            word_counts = {words[word_id]: count for word_id, count in stats.items() if keep[word_id]}
+        speaker_data = {
+            'person_id': stats.person_id,
+            'total_speeches': stats.total_speeches,
+            'word_counts': word_counts
+        }
+        if stats.phrases is not None:
+            speaker_data['top_phrases'] = stats.phrases.top(phrase_top)
+        yield speaker, speaker_data
+
+def speaker_table_to_dict(table: Dict[str, SpeakerStats], vocab: Vocabulary, phrase_top: int = 50) -> Dict:
+    """Convert a speaker table into the plain dict layout used in speaker_statistics.json."""
+    return dict(iter_speaker_table(table, vocab, phrase_top))
+
+def speaker_table_from_records(records: Iterable[Tuple[str, Dict]], vocab: Vocabulary) -> Dict[str, SpeakerStats]:
+    """Rebuild a speaker table from (speaker, data) pairs in the layout used in speaker_statistics.json."""
+    table = defaultdict(SpeakerStats)
+    for speaker, speaker_data in records:
+        stats = table[speaker]
+        stats.person_id = speaker_data['person_id']
+        stats.total_speeches = speaker_data['total_speeches']
+        stats.add_counts({vocab.add(word): count for word, count in speaker_data['word_counts'].items()})
+    return table
+
+def merge_speaker_tables(left: Dict[str, SpeakerStats], right: Dict[str, SpeakerStats],
+                         id_map: Optional[List[int]] = None, include_phrases: bool = True) -> Dict[str, SpeakerStats]:
+    """Merge the right partial table into the left one and return it.
+
+    Speakers keep the order they were first seen in, so merging the tables of consecutive
+    shards in order gives exactly the same word counts as analysing them in one go.
+    """
+    for speaker, stats in right.items():
+        left[speaker].merge(stats, id_map, include_phrases)
+    return left
+
+# A partial table and its time buckets, together with the vocabulary their word ids refer to
+PartialTable = Tuple[Vocabulary, Dict[str, SpeakerStats], Dict[str, Dict[str, SpeakerStats]]]
+
+def merge_partial_tables(left: PartialTable, right: PartialTable) -> PartialTable:
+    """Merge two partial tables built with their own vocabularies, keeping the left vocabulary."""
+    left_vocab, left_table, left_buckets = left
+    right_vocab, right_table, right_buckets = right
+    id_map = left_vocab.remap(right_vocab)
+    merge_speaker_tables(left_table, right_table, id_map)
+    for key, bucket in right_buckets.items():
+        merge_speaker_tables(left_buckets.setdefault(key, defaultdict(SpeakerStats)), bucket, id_map, include_phrases=False)
+    return left_vocab, left_table, left_buckets
+
+def _analyse_shard(parser_options: Dict, shard: List[tuple]) -> Tuple[PartialTable, List[tuple]]:
+    """Worker process entry point: analyse a shard of debate files into a partial table.
+
+    Also returns the files that were analysed without errors.
+    """
+    parser = DebateParser(**parser_options)
+    parser.analyse_files(shard)
+    return (parser.vocab, parser.speakers, parser.buckets), parser.completed_files
+
+def tree_reduce(executor: ProcessPoolExecutor, tables: List[PartialTable]) -> PartialTable:
+    """Merge partial tables in pairs across the pool, halving their number each round."""
+    while len(tables) > 1:
+        merged = list(executor.map(merge_partial_tables, tables[0:-1:2], tables[1::2]))
+        if len(tables) % 2:
+            merged.append(tables[-1])
+        tables = merged
+    return tables[0] if tables else (Vocabulary(), defaultdict(SpeakerStats), {})
+
+class IncrementalManifest:
+    """Record of which debate files are already included in a statistics file.
+
+    Lives next to the output as `<output>.manifest.json`, mapping each `source/filename` to
+    the SHA-256 of the XML that was counted. Each file's own counts are kept gzipped in
+    `<output>.contributions/`, so a file that changes upstream can be subtracted again
+    before its new version is added.
+    """
+
+    def __init__(self, output_file: str):
+        stem = os.path.splitext(output_file)[0]
+        self.manifest_file = f"{stem}.manifest.json"
+        self.contributions_dir = f"{stem}.contributions"
+        self.files: Dict[str, Dict] = {}
+        # Contributions replaced during this run, deleted once the new manifest is saved
+        self.stale_contributions: List[str] = []
+
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.files = json.load(f)['files']
+
+    @staticmethod
+    def file_key(base_url: str, filename: str) -> str:
+        """Key a debate file by its source directory, e.g. 'westminhall/westminster2025-01-09a.xml'."""
+        return f"{base_url.rstrip('/').rsplit('/', 1)[-1]}/{filename}"
+
+    def is_current(self, key: str, digest: str) -> bool:
+        return key in self.files and self.files[key]['sha256'] == digest
+
+    def load_contribution(self, key: str, vocab: Vocabulary) -> Dict[str, SpeakerStats]:
+        with gzip.open(os.path.join(self.contributions_dir, self.files[key]['contribution']), 'rt', encoding='utf-8') as f:
+            return speaker_table_from_records(json.load(f).items(), vocab)
+
+    def record(self, key: str, digest: str, table: Dict[str, SpeakerStats], vocab: Vocabulary):
+        """Store a file's contribution and point the manifest at it."""
+        # The hash is part of the name so the previous contribution survives until the
+        # manifest that stops referring to it has been saved
+        contribution = f"{key.replace('/', '_')}.{digest[:16]}.json.gz"
+        os.makedirs(self.contributions_dir, exist_ok=True)
+        with gzip.open(os.path.join(self.contributions_dir, contribution), 'wt', encoding='utf-8') as f:
+            json.dump(speaker_table_to_dict(table, vocab), f, ensure_ascii=False)
+
+        if key in self.files and self.files[key]['contribution'] != contribution:
+            self.stale_contributions.append(self.files[key]['contribution'])
+        self.files[key] = {'sha256': digest, 'contribution': contribution}
+
+    def remove(self, key: str):
+        """Forget a file, deleting its contribution once the manifest is saved."""
+        self.stale_contributions.append(self.files.pop(key)['contribution'])
+
+    def discard(self):
+        """Forget every file, so the statistics are rebuilt from scratch."""
+        for key in list(self.files):
+            self.remove(key)
+
+    def save(self):
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.manifest_file)
+
+        # A file counted again with the same contents is given its old contribution's name
+        referenced = {entry['contribution'] for entry in self.files.values()}
+        for contribution in self.stale_contributions:
+            if contribution in referenced:
+                continue
+            try:
+                os.remove(os.path.join(self.contributions_dir, contribution))
+            except FileNotFoundError:
+                pass
+        self.stale_contributions = []
+
+class RunCheckpoint:
+    """Periodic snapshots of a long analyse_date_range run, so it can be resumed after a crash.
+
+    Lives next to the output as `<output>.checkpoint/`. Each checkpoint only writes the counts
+    of the debate files finished since the previous one, as a gzipped segment that also lists
+    those files, and `state.json` (replaced atomically) names the segments in order. Once
+    `compact_after` segments have built up, the whole table is written as a single segment instead.
+    """
+
+    def __init__(self, output_file: str, every: int = 50, compact_after: int = 20):
+        self.directory = f"{os.path.splitext(output_file)[0]}.checkpoint"
+        self.state_file = os.path.join(self.directory, 'state.json')
+        # Number of finished debate files between checkpoints
+        self.every = every
+        self.compact_after = compact_after
+        self.settings: Dict = {}
+        self.segments: List[str] = []
+        # Segment names are never reused, so compaction cannot delete a segment still in use
+        self.next_segment = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.state_file)
+
+    def _save_state(self):
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'settings': self.settings, 'segments': self.segments, 'next_segment': self.next_segment}, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _write_segment(self, name: str, speakers: Dict[str, SpeakerStats], buckets: Dict[str, Dict[str, SpeakerStats]],
+                       vocab: Vocabulary, files: List[str], phrase_snapshots: Optional[Dict[str, SpaceSaving]] = None):
+        segment = {
+            'files': files,
+            'speakers': speaker_table_to_dict(speakers, vocab),
+            # Partial summaries, merged into the earlier segments' ones
+            'phrases': {speaker: stats.phrases.to_dict() for speaker, stats in speakers.items() if stats.phrases is not None},
+            # Whole summaries so far, which replace the earlier segments' ones
+            'phrase_snapshots': {speaker: phrases.to_dict() for speaker, phrases in (phrase_snapshots or {}).items()},
+            'buckets': {key: speaker_table_to_dict(bucket, vocab) for key, bucket in buckets.items()}
+        }
+        tmp_file = os.path.join(self.directory, f"{name}.tmp")
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+            json.dump(segment, f, ensure_ascii=False)
+        os.replace(tmp_file, os.path.join(self.directory, name))
+
+    def reset(self, settings: Dict):
+        """Start a new, empty checkpoint for a run with the given settings."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+        self.settings = settings
+        self.segments = []
+        self.next_segment = 0
+        self._save_state()
+
+    def load(self, settings: Dict, vocab: Vocabulary) -> Tuple[Dict[str, SpeakerStats], Dict[str, Dict[str, SpeakerStats]], Set[str]]:
+        """Read every segment back, returning the speaker table, time buckets and finished file keys."""
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state['settings'] != settings:
+            raise ValueError(f"{self.directory} was written with different settings ({state['settings']}), "
+                             f"so it cannot be resumed with {settings}")
+        self.settings = settings
+        self.segments = state['segments']
+        self.next_segment = state['next_segment']
+
+        speakers = defaultdict(SpeakerStats)
+        buckets = {}
+        completed = set()
+        for name in self.segments:
+            with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as f:
+                segment = json.load(f)
+            table = speaker_table_from_records(segment['speakers'].items(), vocab)
+            for speaker, phrases in segment['phrases'].items():
+                table[speaker].phrases = SpaceSaving.from_dict(phrases)
+            merge_speaker_tables(speakers, table)
+            for speaker, phrases in segment.get('phrase_snapshots', {}).items():
+                speakers[speaker].phrases = SpaceSaving.from_dict(phrases)
+            for key, bucket in segment['buckets'].items():
+                merge_speaker_tables(buckets.setdefault(key, defaultdict(SpeakerStats)),
+                                     speaker_table_from_records(bucket.items(), vocab))
+            completed.update(segment['files'])
+        return speakers, buckets, completed
+
+    def add(self, speakers: Dict[str, SpeakerStats], buckets: Dict[str, Dict[str, SpeakerStats]],
+            vocab: Vocabulary, files: List[str], phrase_snapshots: Optional[Dict[str, SpaceSaving]] = None):
+        """Save the counts of newly finished files as the next segment, with any phrase summaries they changed."""
+        name = f"segment-{self.next_segment:05d}.json.gz"
+        self.next_segment += 1
+        self._write_segment(name, speakers, buckets, vocab, files, phrase_snapshots)
+        self.segments.append(name)
+        self._save_state()
+
+    def compact(self, speakers: Dict[str, SpeakerStats], buckets: Dict[str, Dict[str, SpeakerStats]],
+                vocab: Vocabulary, files: List[str]):
+        """Replace every segment with one holding the full table so far."""
+        old_segments = self.segments
+        name = f"compacted-{self.next_segment:05d}.json.gz"
+        self.next_segment += 1
+        self._write_segment(name, speakers, buckets, vocab, files)
+        self.segments = [name]
+        self._save_state()
+        for old_name in old_segments:
+            os.remove(os.path.join(self.directory, old_name))
+
+    def clear(self):
+        """Remove the checkpoint once the run's results have been saved."""
+        shutil.rmtree(self.directory, ignore_errors=True)
 
 class DebateParser:
-    def __init__(self):
+    def __init__(self, concurrency: int = 1, cache: Optional[XMLCache] = None,
+                 listing_ttl: float = 3600, file_ttl: float = 86400, xml_backend: str = DEFAULT_BACKEND,
+                 workers: int = 1, source=None, bucket_by: Optional[str] = None,
+                 phrase_capacity: Optional[int] = None, phrase_lengths: Tuple[int, ...] = (2, 3), phrase_top: int = 50,
+                 filter_words: bool = False, tag_cache_path: Optional[str] = None, metrics: Optional[RunMetrics] = None):
         self.base_urls = [
             "https://www.theyworkforyou.com/pwdata/scrapedxml/debates/",
             "https://www.theyworkforyou.com/pwdata/scrapedxml/westminhall/"
         ]
         self.speakers: Dict[str, SpeakerStats] = defaultdict(SpeakerStats)
+        # Word ids shared by every speaker's counts
+        self.vocab = Vocabulary()
+        # Number of debate files downloaded at the same time (1 = sequential)
+        self.concurrency = max(1, concurrency)
+        self.session = self._create_session()
+        # Optional on-disk cache, and how many seconds a cached listing or debate file is
+        # trusted before it is revalidated with the server
+        self.cache = cache
+        self.listing_ttl = listing_ttl
+        self.file_ttl = file_ttl
+        # Turns a debate file into (speakername, person_id, text) tuples
+        self.xml_backend = xml_backend
+        self.iter_speeches = PARSER_BACKENDS[xml_backend]
+        # Number of processes debate files are shared between (1 = analyse in this process)
+        self.workers = max(1, workers)
+        # Where debate files are listed and read from; None means TheyWorkForYou over HTTP
+        self.source = source
+        self._file_index: Optional[DebateFileIndex] = None
+        # Optionally keep counts per sitting 'day' or 'month' as well as the lifetime totals
+        self.bucket_by = bucket_by
+        self.buckets: Dict[str, Dict[str, SpeakerStats]] = {}
+        # Optionally track each speaker's most frequent phrases of the given lengths in a
+        # summary of at most phrase_capacity entries, saving the top phrase_top of them
+        self.phrase_capacity = phrase_capacity
+        self.phrase_lengths = tuple(phrase_lengths)
+        self.phrase_top = phrase_top
+        # Optionally drop the words sanitise_json.py would remove as speeches are counted, so
+        # they are never stored. Each word is judged once, using the sanitiser's SQLite cache
+        # of spaCy analyses at tag_cache_path (None keeps analyses in memory only)
+        self.filter_words = filter_words
+        self.tag_cache_path = tag_cache_path
+        self.word_filter = self.get_word_filter() if filter_words else None
+        # (base_url, filename) of every debate file analysed without errors
+        self.completed_files: List[tuple] = []
+        # Set while analyse_date_range is checkpointing: the counts from files finished before
+        # the last checkpoint, and the keys of those finished since
+        self._checkpoint: Optional[RunCheckpoint] = None
+        # Phrase summaries stay in the committed table rather than the counts since the last
+        # checkpoint, so they are never split up and merged back together
+        self._committed: Optional[PartialTable] = None
+        self._uncommitted_files: List[str] = []
+        self._resumed_files: List[str] = []
+        # Stage timers and counters for the run report
+        self.metrics = metrics or RunMetrics('parse_debates')
+        self.metrics.record_rate('speeches_per_second', 'speeches', 'analyse')
+        self.metrics.record_rate('words_per_second', 'words', 'analyse')
+
+    def _create_session(self) -> HTTPClient:
+        """Create a client whose keep-alive pool has a connection for every download thread.
+
+        Downloads are not rate limited until the server answers with a 429 or 503, and
+        failed requests are retried with backoff.
+        """
+        return HTTPClient(rate=None, max_rate=None, pool_size=self.concurrency)
+
+    def get_word_filter(self):
+        """Return the filter deciding which words of the vocabulary sanitise_json.py would keep."""
+        if getattr(self, 'word_filter', None) is None:
+            # Only imported when needed, as it brings in the sanitiser and spaCy
+            from word_filter import WordFilter
+            self.word_filter = WordFilter(self.vocab, self.tag_cache_path)
+        return self.word_filter
+
+    def fetch_url(self, url: str, max_age: Optional[float] = None) -> bytes:
+        """Download a URL, going through the cache if one is configured."""
+        if self.cache:
+            return self.cache.get(self.session, url, max_age)
+        response = self.session.get(url)
+        response.raise_for_status()
+        return response.content
         
+    def get_source(self):
+        """Return the configured debate file source, defaulting to TheyWorkForYou over HTTP."""
+        if self.source is None:
+            self.source = HTTPSource(self.base_urls, self.fetch_url, self.listing_ttl, self.file_ttl)
+        return self.source
+
     def get_debate_files(self, start_date: str, end_date: str) -> List[str]:
         """Get list of debate files between start_date and end_date from all sources."""
-        print("Fetching debate file lists...")
-        debate_files = []
-        
-        # Convert input dates to datetime objects
-        start = parser.parse(start_date).date()
-        end = parser.parse(end_date).date()
-        
-        for base_url in self.base_urls:
-            try:
-                response = requests.get(base_url)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find all links that match the debate file pattern
-                links = soup.find_all('a', href=re.compile(r'(?:debates|westminster)\d{4}-\d{2}-\d{2}[a-z]?.xml'))
-                print(f"Found {len(links)} total debate files in {base_url}")
-                
-                for link in links:
-                    filename = link['href']
-                    # Extract date from filename using either debates or westminster pattern
-                    date_match = re.search(r'(?:debates|westminster)(\d{4}-\d{2}-\d{2})', filename)
-                    if date_match:
-                        file_date = parser.parse(date_match.group(1)).date()
-                        if start <= file_date <= end:
-                            debate_files.append((base_url, filename))
-            except Exception as e:
-                print(f"Error whilst accessing {base_url}: {str(e)}")
-        
-        return sorted(debate_files)
+        if self._file_index is None:
+            print("Fetching debate file lists...")
+            # Listing the whole archive is done once; date ranges are then binary searches
+            with self.metrics.stage('list_files'):
+                self._file_index = DebateFileIndex(self.get_source().list_files())
+
+        # Normalise input dates to YYYY-MM-DD so they compare with the indexed dates
+        start = parser.parse(start_date).date().isoformat()
+        end = parser.parse(end_date).date().isoformat()
+        return self._file_index.between(start, end)
+
+    def analyse_speech(self, speaker_name: str, person_id: str, text: str,
+                       speakers: Optional[Dict[str, SpeakerStats]] = None) -> int:
+        """Analyse the text of a single speech and update speaker statistics (or the given partial table).
+
+        Returns the number of words counted.
+        """
+        if speakers is None:
+            speakers = self.speakers
 
-    def analyse_speech(self, speech_tag):
-        """Analyse a single speech tag and update speaker statistics."""
-        speaker_name = speech_tag.get('speakername', 'Unknown')
-        person_id = speech_tag.get('person_id', 'Unknown')
-        
         # Update speaker stats
         if speaker_name != 'Unknown':
-            self.speakers[speaker_name].person_id = person_id
-            self.speakers[speaker_name].total_speeches += 1
+            speakers[speaker_name].person_id = person_id
+            speakers[speaker_name].total_speeches += 1
             
-            # Get all text content from the speech
-            text = ' '.join(speech_tag.stripped_strings)
-            
-            # Split into words and count
-            words = re.findall(r'\b\w+\b', text.lower())
-            for word in words:
-                if len(word) > 1:  # Omit single-letter words
-                    self.speakers[speaker_name].word_counts[word] += 1
-
-    def analyse_debate_file(self, base_url: str, filename: str):
-        """Analyse a single debate file."""
-        url = f"{base_url}{filename}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'xml')
-            
-            # Find all speech tags
-            speeches = soup.find_all('speech')
-            print(f"Found {len(speeches)} speeches in {filename}")
+            # Split into words (omitting single-letter words) and count
+            text = text.lower()
+            words = re.findall(r'\b\w{2,}\b', text)
+            word_ids = self.vocab.ids
+            if not word_ids.keys() >= set(words):
+                # New words get ids in order of first use, as set order would vary between runs
+                for word in dict.fromkeys(words):
+                    if word not in word_ids:
+                        self.vocab.add(word)
+            speakers[speaker_name].add_counts(map(word_ids.__getitem__, words))
+
+            if self.phrase_capacity:
+                # Every speech updates one summary per speaker, even when counts are split by file or checkpoint
+                stats = (self._committed[1] if self._committed else self.speakers)[speaker_name]
+                if stats.phrases is None:
+                    stats.phrases = SpaceSaving(self.phrase_capacity)
+                stats.phrases.update(count_phrases(text, self.phrase_lengths))
+            return len(words)
+        return 0
+
+    def fetch_debate_file(self, base_url: str, filename: str) -> bytes:
+        """Download (or read) a single debate file and return its raw XML."""
+        with self.metrics.stage('fetch'):
+            return self.get_source().read(base_url, filename)
             
+    def parse_debate_file(self, base_url: str, filename: str) -> List[tuple]:
+        """Download a single debate file and return its (speakername, person_id, text) speeches."""
+        content = self.fetch_debate_file(base_url, filename)
+        with self.metrics.stage('parse'):
+            return list(self.iter_speeches(BytesIO(content)))
+
+    def analyse_speeches(self, filename: str, speeches, speakers: Optional[Dict[str, SpeakerStats]] = None):
+        """Analyse the (speakername, person_id, text) speeches of a single debate file."""
+        # With time buckets, count the file on its own so it can be added to its bucket as well,
+        # and when filtering, so the words it brings are judged together once it has been counted
+        own_table = speakers is None and (self.bucket_by or self.word_filter)
+        if own_table:
+            speakers = defaultdict(SpeakerStats)
+
+        speech_count = word_count = 0
+        # When speeches are streamed straight from the parser, parsing is timed as part of counting
+        with self.metrics.stage('count'):
             for speech in speeches:
-                self.analyse_speech(speech)
+                word_count += self.analyse_speech(*speech, speakers=speakers)
+                speech_count += 1
+        self.metrics.count('speeches', speech_count)
+        self.metrics.count('words', word_count)
+
+        if self.word_filter:
+            with self.metrics.stage('filter'):
+                keep = self.word_filter.update()
+                for stats in speakers.values():
+                    stats.keep_only(keep)
+
+        if own_table:
+            self.speakers = merge_speaker_tables(self.speakers, speakers)
+            if self.bucket_by:
+                self.add_to_bucket(filename, speakers)
+            
+        print(f"Found {speech_count} speeches in {filename}")
                 
+    def get_bucket(self, filename: str) -> Dict[str, SpeakerStats]:
+        """Return the time bucket a debate file's sitting date falls into."""
+        key = bucket_key(DEBATE_FILE_PATTERN.search(filename).group(1), self.bucket_by)
+        return self.buckets.setdefault(key, defaultdict(SpeakerStats))
+
+    def add_to_bucket(self, filename: str, table: Dict[str, SpeakerStats]):
+        # Phrase summaries are only kept for the lifetime totals
+        merge_speaker_tables(self.get_bucket(filename), table, include_phrases=False)
+
+    def analyse_debate_file(self, base_url: str, filename: str) -> bool:
+        """Analyse a single debate file, streaming its speeches straight from the parser."""
+        try:
+            content = self.fetch_debate_file(base_url, filename)
+            self.analyse_speeches(filename, self.iter_speeches(BytesIO(content)))
+            return True
         except Exception as e:
             print(f"Error whilst processing {filename}: {str(e)}")
+            self.metrics.count('file_errors')
+            return False
+
+    def prefetch_debate_files(self, debate_files: List[tuple], load=None):
+        """Download and parse debate files on a thread pool, yielding ((base_url, filename), future) in input order.
+
+        At most twice `concurrency` files are in flight at once, so memory stays bounded,
+        while results are still handed back in the same order as the sequential path.
+        `load(base_url, filename)` is run for each file, and defaults to `parse_debate_file`.
+        """
+        load = load or self.parse_debate_file
+        files = iter(debate_files)
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            def submit_next():
+                next_file = next(files, None)
+                if next_file:
+                    pending.append((next_file, executor.submit(load, *next_file)))
+
+            for _ in range(self.concurrency * 2):
+                submit_next()
+
+            while pending:
+                debate_file, future = pending.popleft()
+                submit_next()
+                yield debate_file, future
+
+    def analyse_files(self, debate_files: List[tuple]):
+        """Analyse a list of (base_url, filename) debate files in this process."""
+        if self.concurrency > 1:
+            # Files are downloaded and parsed in the background as they arrive, but their
+            # speeches are counted in file order so the results match the sequential path
+            for (base_url, filename), future in tqdm(self.prefetch_debate_files(debate_files),
+                                                     total=len(debate_files), desc="Analysing debate files"):
+                try:
+                    # Time spent here means counting is waiting on downloads
+                    with self.metrics.stage('wait_for_downloads'):
+                        speeches = future.result()
+                    self.analyse_speeches(filename, speeches)
+                    self.file_completed(base_url, filename)
+                except Exception as e:
+                    print(f"Error whilst processing {filename}: {str(e)}")
+                    self.metrics.count('file_errors')
+        else:
+            for base_url, filename in tqdm(debate_files, desc="Analysing debate files"):
+                if self.analyse_debate_file(base_url, filename):
+                    self.file_completed(base_url, filename)
+
+    def file_completed(self, base_url: str, filename: str):
+        """Note that a debate file has been counted, checkpointing once enough files have been."""
+        self.completed_files.append((base_url, filename))
+        self.metrics.count('files')
+        if self._checkpoint:
+            self._uncommitted_files.append(IncrementalManifest.file_key(base_url, filename))
+            if len(self._uncommitted_files) >= self._checkpoint.every:
+                self.write_checkpoint()
+
+    def write_checkpoint(self):
+        """Save the counts since the last checkpoint, then fold them into the committed totals.
+
+        While checkpointing, `speakers` and `buckets` only hold the files since the last checkpoint.
+        """
+        checkpoint = self._checkpoint
+        with self.metrics.stage('checkpoint'):
+            committed = merge_partial_tables(self._committed, (self.vocab, self.speakers, self.buckets))
+            if len(checkpoint.segments) + 1 >= checkpoint.compact_after:
+                files = [IncrementalManifest.file_key(*debate_file) for debate_file in self.completed_files]
+                checkpoint.compact(committed[1], committed[2], self.vocab, self._resumed_files + files)
+            else:
+                checkpoint.add(self.speakers, self.buckets, self.vocab, self._uncommitted_files,
+                               {speaker: committed[1][speaker].phrases for speaker in self.speakers
+                                if committed[1][speaker].phrases is not None})
+        self._committed = committed
+        self.speakers = defaultdict(SpeakerStats)
+        self.buckets = {}
+        self._uncommitted_files = []
+
+    def analyse_files_in_processes(self, debate_files: List[tuple]):
+        """Split debate files into contiguous shards, analyse each in a worker process and merge the results.
+
+        The partial tables are merged with a tree reduction inside the pool, and because shards
+        are contiguous and merged in order the output is the same for any number of workers.
+        """
+        parser_options = {
+            'concurrency': self.concurrency,
+            'cache': self.cache,
+            'listing_ttl': self.listing_ttl,
+            'file_ttl': self.file_ttl,
+            'xml_backend': self.xml_backend,
+            # Each worker builds its own HTTP session, but local sources can be shared
+            'source': None if isinstance(self.source, HTTPSource) else self.source,
+            'bucket_by': self.bucket_by,
+            'phrase_capacity': self.phrase_capacity,
+            'phrase_lengths': self.phrase_lengths,
+            'filter_words': self.filter_words,
+            'tag_cache_path': self.tag_cache_path
+        }
+        if not debate_files:
+            return
+        # A few shards per worker keeps every process busy when some sitting days are longer
+        shard_count = min(len(debate_files), self.workers * 4)
+        shard_size = -(-len(debate_files) // shard_count)
+        shards = [debate_files[i:i + shard_size] for i in range(0, len(debate_files), shard_size)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            tables = []
+            for table, completed_files in tqdm(executor.map(_analyse_shard, [parser_options] * len(shards), shards),
+                                               total=len(shards), desc="Analysing debate file shards"):
+                tables.append(table)
+                self.completed_files.extend(completed_files)
+                # Workers keep their own metrics, so their speeches and words are counted from the shard
+                shard_vocab, shard_speakers, shard_buckets = table
+                self.metrics.count('files', len(completed_files))
+                self.metrics.count('speeches', sum(stats.total_speeches for stats in shard_speakers.values()))
+                self.metrics.count('words', sum(count for stats in shard_speakers.values() for _, count in stats.items()))
+                if self._checkpoint:
+                    # Every shard is checkpointed as soon as it comes back, in its own vocabulary
+                    with self.metrics.stage('checkpoint'):
+                        self._checkpoint.add(shard_speakers, shard_buckets, shard_vocab,
+                                             [IncrementalManifest.file_key(*debate_file) for debate_file in completed_files])
+            print(f"Merging {len(tables)} partial tables...")
+            with self.metrics.stage('merge'):
+                _, self.speakers, self.buckets = merge_partial_tables((self.vocab, self.speakers, self.buckets),
+                                                                      tree_reduce(executor, tables))
+
+    def checkpoint_settings(self, start_date: str, end_date: str) -> Dict:
+        """Settings a checkpoint must have been written with for a run to resume from it."""
+        return {
+            'start_date': parser.parse(start_date).date().isoformat(),
+            'end_date': parser.parse(end_date).date().isoformat(),
+            'bucket_by': self.bucket_by,
+            'phrase_capacity': self.phrase_capacity,
+            'phrase_lengths': list(self.phrase_lengths),
+            'filter_words': self.filter_words
+        }
+
+    def analyse_date_range(self, start_date: str, end_date: str, checkpoint: Optional[RunCheckpoint] = None,
+                           resume: bool = False, discard_checkpoint: bool = False):
+        """Analyse all debate files between start_date and end_date.
+
+        With a checkpoint, progress is saved every `checkpoint.every` files (or every shard with
+        several workers), and `resume` picks up from the files a previous run had finished. An
+        existing checkpoint is never thrown away unless `discard_checkpoint` is given.
+        """
+        if checkpoint and not resume and not discard_checkpoint and checkpoint.exists():
+            raise FileExistsError(f"{checkpoint.directory} holds the progress of an unfinished run")
 
-    def analyse_date_range(self, start_date: str, end_date: str):
-        """Analyse all debate files between start_date and end_date."""
         debate_files = self.get_debate_files(start_date, end_date)
         print(f"Found {len(debate_files)} total debate files to analyse")
         
         if not debate_files:
             print("Warning: No debate files found for the specified date range!")
             return
+
+        self._resumed_files = []
+        if checkpoint:
+            settings = self.checkpoint_settings(start_date, end_date)
+            if resume and checkpoint.exists():
+                speakers, buckets, completed = checkpoint.load(settings, self.vocab)
+                self.speakers = merge_speaker_tables(self.speakers, speakers)
+                for key, bucket in buckets.items():
+                    merge_speaker_tables(self.buckets.setdefault(key, defaultdict(SpeakerStats)), bucket)
+                self._resumed_files = sorted(completed)
+                debate_files = [debate_file for debate_file in debate_files
+                                if IncrementalManifest.file_key(*debate_file) not in completed]
+                print(f"Resuming from {checkpoint.directory}: {len(completed)} files already analysed, "
+                      f"{len(debate_files)} left")
+                if not debate_files:
+                    # The run finished analysing and stopped while saving
+                    return
+            else:
+                if resume:
+                    print(f"No checkpoint found in {checkpoint.directory}, so starting from the beginning")
+                checkpoint.reset(settings)
             
-        for base_url, filename in tqdm(debate_files, desc="Analysing debate files"):
-            self.analyse_debate_file(base_url, filename)
+        if self.workers > 1:
+            # Worker results are merged onto whatever was resumed, so no split is needed
+            self._checkpoint = checkpoint
+            try:
+                with self.metrics.stage('analyse'):
+                    self.analyse_files_in_processes(debate_files)
+            finally:
+                self._checkpoint = None
+        else:
+            if checkpoint:
+                self._checkpoint = checkpoint
+                self._committed = (self.vocab, self.speakers, self.buckets)
+                self.speakers = defaultdict(SpeakerStats)
+                self.buckets = {}
+            try:
+                with self.metrics.stage('analyse'):
+                    self.analyse_files(debate_files)
+            finally:
+                if checkpoint:
+                    _, self.speakers, self.buckets = merge_partial_tables(self._committed,
+                                                                          (self.vocab, self.speakers, self.buckets))
+                    self._checkpoint = self._committed = None
+                    self._uncommitted_files = []
             
         if not self.speakers:
             print("Warning: No speakers found in any of the analysed files!")
 
+    def load_results(self, input_file: str):
+        """Load previously saved statistics (in any output format) so that new debate files can be added to them."""
+        self.speakers = merge_speaker_tables(self.speakers, speaker_table_from_records(iter_speaker_records(input_file), self.vocab))
+
+    def analyse_date_range_incrementally(self, start_date: str, end_date: str, output_file: str) -> IncrementalManifest:
+        """Add only new or changed debate files between start_date and end_date to existing statistics.
+
+        The returned manifest must be saved after the statistics themselves, so the two never disagree.
+        """
+        manifest = IncrementalManifest(output_file)
+        if manifest.files and os.path.exists(output_file):
+            print(f"Loading existing statistics for {len(manifest.files)} debate files from {output_file}")
+            with self.metrics.stage('load_existing'):
+                self.load_results(output_file)
+                if self.bucket_by and os.path.exists(self.bucket_store_path(output_file)):
+                    self.load_buckets(self.bucket_store_path(output_file))
+        elif manifest.files:
+            print(f"Warning: {output_file} is missing, so its manifest is discarded and it will be rebuilt from scratch")
+            manifest.discard()
+        elif os.path.exists(output_file):
+            print(f"Warning: {output_file} has no manifest, so it will be rebuilt from scratch")
+
+        debate_files = self.get_debate_files(start_date, end_date)
+        print(f"Found {len(debate_files)} total debate files to check")
+
+        # Files counted before that are in the date range but no longer listed were removed upstream,
+        # unless their directory could not be listed this time, in which case they are kept as they are
+        start = parser.parse(start_date).date().isoformat()
+        end = parser.parse(end_date).date().isoformat()
+        listed = {manifest.file_key(base_url, filename) for base_url, filename in debate_files}
+        unlisted = {manifest.file_key(location, '') for location in self.get_source().failed_locations}
+        removed_files = kept_files = 0
+        for key in list(manifest.files):
+            directory, _, filename = key.rpartition('/')
+            if key in listed or not start <= DEBATE_FILE_PATTERN.search(filename).group(1) <= end:
+                continue
+            if f"{directory}/" in unlisted:
+                kept_files += 1
+                continue
+            self.subtract_contribution(manifest, key, filename)
+            manifest.remove(key)
+            removed_files += 1
+        if kept_files:
+            print(f"Warning: {kept_files} debate files counted before are in directories that could not be listed, "
+                  f"so their statistics are kept unchanged")
+
+        new_files = changed_files = 0
+        with self.metrics.stage('analyse'):
+            for (base_url, filename), future in tqdm(self.prefetch_debate_files(debate_files, load=self.fetch_debate_file),
+                                                     total=len(debate_files), desc="Checking debate files"):
+                try:
+                    with self.metrics.stage('wait_for_downloads'):
+                        content = future.result()
+                    key = manifest.file_key(base_url, filename)
+                    digest = hashlib.sha256(content).hexdigest()
+                    if manifest.is_current(key, digest):
+                        continue
+
+                    table = defaultdict(SpeakerStats)
+                    self.analyse_speeches(filename, self.iter_speeches(BytesIO(content)), speakers=table)
+
+                    if key in manifest.files:
+                        # The file changed upstream, so take its old counts back out first
+                        self.subtract_contribution(manifest, key, filename)
+                        changed_files += 1
+                    else:
+                        new_files += 1
+
+                    self.speakers = merge_speaker_tables(self.speakers, table)
+                    if self.bucket_by:
+                        self.add_to_bucket(filename, table)
+                    manifest.record(key, digest, table, self.vocab)
+                    self.metrics.count('files')
+                except Exception as e:
+                    print(f"Error whilst processing {filename}: {str(e)}")
+                    self.metrics.count('file_errors')
+
+        print(f"Added {new_files} new and {changed_files} changed debate files, and removed {removed_files}")
+        return manifest
+
+    def subtract_contribution(self, manifest: IncrementalManifest, key: str, filename: str):
+        """Take a debate file's previously counted statistics back out of the totals and its bucket."""
+        old_table = manifest.load_contribution(key, self.vocab)
+        for target in [self.speakers] + ([self.get_bucket(filename)] if self.bucket_by else []):
+            for speaker, stats in old_table.items():
+                if speaker in target:
+                    target[speaker].subtract(stats)
+                    # The speaker may still have counts from the bucket's other files
+                    if target[speaker].total_speeches <= 0 and not target[speaker].word_ids:
+                        del target[speaker]
+        if self.bucket_by and not self.get_bucket(filename):
+            del self.buckets[bucket_key(DEBATE_FILE_PATTERN.search(filename).group(1), self.bucket_by)]
+
+    @staticmethod
+    def bucket_store_path(output_file: str) -> str:
+        """Directory the time buckets for an output file are stored in."""
+        return f"{os.path.splitext(output_file)[0]}.buckets"
+
+    def save_buckets(self, store_dir: str):
+        """Save the time-bucketed counts to a columnar store that word_buckets.py can query."""
+        speaker_index = {}
+        for bucket in self.buckets.values():
+            for speaker, stats in bucket.items():
+                if speaker not in speaker_index:
+                    speaker_index[speaker] = (len(speaker_index), stats.person_id)
+
+        buckets = {}
+        for key, bucket in self.buckets.items():
+            entries = []
+            for speaker, stats in bucket.items():
+                # The store keeps each speaker's rows sorted by word id, so words can be binary searched
+                rows = sorted(stats.items())
+                entries.append((speaker_index[speaker][0], stats.total_speeches,
+                                array('I', [word_id for word_id, _ in rows]), array('I', [count for _, count in rows])))
+            buckets[key] = entries
+
+        speakers = [(speaker, person_id) for speaker, (_, person_id) in speaker_index.items()]
+        write_bucket_store(store_dir, self.bucket_by, self.vocab.words, speakers, buckets)
+
+    def load_buckets(self, store_dir: str):
+        """Load time buckets saved by an earlier run so that new debate files can be added to them."""
+        store = BucketStore(store_dir)
+        if store.bucket_by != self.bucket_by:
+            raise ValueError(f"{store_dir} holds {store.bucket_by} buckets, not {self.bucket_by} buckets")
+        id_map = [self.vocab.add(word) for word in store.words]
+        for key in store.keys:
+            bucket = self.buckets.setdefault(key, defaultdict(SpeakerStats))
+            rows = {speaker_index: (word_ids, counts) for speaker_index, word_ids, counts in store.iter_bucket(key)}
+            for speaker_index, speeches in enumerate(store.speech_counts(key)):
+                if not speeches and speaker_index not in rows:
+                    continue
+                speaker, person_id = store.speakers[speaker_index]
+                stats = bucket[speaker]
+                stats.person_id = person_id
+                stats.total_speeches = speeches
+                word_ids, counts = rows.get(speaker_index, ((), ()))
+                stats.add_counts({id_map[word_id]: count for word_id, count in zip(word_ids, counts)})
+
     def save_results(self, output_file: str):
-        """Save the results to a JSON file."""
-        results = {}
-        for speaker, stats in self.speakers.items():
-            results[speaker] = {
-                'person_id': stats.person_id,
-                'total_speeches': stats.total_speeches,
-                'word_counts': dict(stats.word_counts)
-            }
-            
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        """Save the results one speaker at a time, expanding word ids back into words.
+
+        The format follows the file extension: .json, .ndjson/.jsonl or .msgpack.
+        """
+        write_speaker_records(output_file, iter_speaker_table(self.speakers, self.vocab, self.phrase_top))
+
+    def save_filtered_results(self, output_file: str):
+        """Save the results with only the words sanitise_json.py would keep, in any output format."""
+        keep = self.get_word_filter().update()
+        write_speaker_records(output_file, iter_speaker_table(self.speakers, self.vocab, self.phrase_top, keep))
+
+    def save_to_db(self, db_path: str, filtered_too: bool = False):
+        """Upsert the word counts into the database, as the cleaned dataset if they were filtered and else the raw one.
+
+        With filtered_too, the counts without the words sanitise_json.py would remove are saved as the cleaned dataset as well.
+        """
+        with ParliamentDB(db_path) as db:
+            db.write_speaker_records(CLEANED_DATASET if self.filter_words else RAW_DATASET,
+                                     iter_speaker_table(self.speakers, self.vocab, self.phrase_top))
+            if filtered_too and not self.filter_words:
+                keep = self.get_word_filter().update()
+                db.write_speaker_records(CLEANED_DATASET, iter_speaker_table(self.speakers, self.vocab, self.phrase_top, keep))
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="Count the words used by each speaker in Commons and Westminster Hall debates.")
+    arg_parser.add_argument('--start-date', default="2024-07-17", help="First sitting day to analyse (YYYY-MM-DD)")
+    arg_parser.add_argument('--end-date', default="2025-03-06", help="Last sitting day to analyse (YYYY-MM-DD)")
+    arg_parser.add_argument('--concurrency', type=int, default=8,
+                            help="Number of debate files to download at once (1 downloads them one by one)")
+    arg_parser.add_argument('--output', default="speaker_statistics.json",
+                            help="File to save the statistics to (.json, or .ndjson / .msgpack to stream one speaker at a time)")
+    arg_parser.add_argument('--cache-dir', default="twfy_cache", help="Directory to cache downloaded XML files in")
+    arg_parser.add_argument('--no-cache', action='store_true', help="Always download files instead of using the cache")
+    arg_parser.add_argument('--listing-ttl', type=float, default=3600,
+                            help="Seconds before a cached directory listing is revalidated")
+    arg_parser.add_argument('--file-ttl', type=float, default=86400,
+                            help="Seconds before a cached debate file is revalidated")
+    arg_parser.add_argument('--offline', action='store_true', help="Only use files that are already in the cache")
+    source_group = arg_parser.add_mutually_exclusive_group()
+    source_group.add_argument('--source-dir',
+                              help="Read debate files from a local mirror of pwdata's scrapedxml/ directory instead of HTTP")
+    source_group.add_argument('--source-tar',
+                              help="Read debate files from a tarball of pwdata's scrapedxml/ directory instead of HTTP")
+    arg_parser.add_argument('--xml-backend', choices=sorted(PARSER_BACKENDS), default=DEFAULT_BACKEND,
+                            help="Parser used to read speeches (lxml streams them, bs4 loads the whole file)")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="Number of processes to analyse debate files in (word counts are the same for any number)")
+    arg_parser.add_argument('--bucket-by', choices=sorted(BUCKET_KEY_LENGTHS),
+                            help="Also save counts per sitting day or month, for date range queries with word_buckets.py")
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help="Only analyse debate files that are new or changed since the last run, adding them to --output")
+    arg_parser.add_argument('--checkpoint-every', type=int, default=50,
+                            help="Save progress every N debate files, so an interrupted run can be resumed (0 turns this off)")
+    arg_parser.add_argument('--resume', action='store_true',
+                            help="Carry on from the last checkpoint of an interrupted run with the same options")
+    arg_parser.add_argument('--discard-checkpoint', action='store_true',
+                            help="Throw away the checkpoint of an unfinished run and start again from the beginning")
+    arg_parser.add_argument('--phrases', action='store_true',
+                            help="Also save each speaker's most frequent phrases (as top_phrases, with error bounds)")
+    arg_parser.add_argument('--phrase-capacity', type=int, default=1000,
+                            help="Most phrases tracked per speaker, which bounds memory use and the error of each count")
+    arg_parser.add_argument('--phrase-lengths', type=int, nargs='+', default=[2, 3],
+                            help="Numbers of words in the phrases counted")
+    arg_parser.add_argument('--phrase-top', type=int, default=50, help="Number of phrases saved per speaker")
+    arg_parser.add_argument('--filter', action='store_true',
+                            help="Drop the words sanitise_json.py would remove while counting, so --output holds cleaned statistics")
+    arg_parser.add_argument('--filtered-output',
+                            help="Also save the statistics with only the words sanitise_json.py would keep to this file")
+    arg_parser.add_argument('--tag-cache', default='spacy_tag_cache.sqlite',
+                            help="SQLite file of spaCy word analyses shared with sanitise_json.py, used by --filter and --filtered-output")
+    arg_parser.add_argument('--no-tag-cache', action='store_true',
+                            help="Analyse every word with spaCy instead of using the saved analyses")
+    arg_parser.add_argument('--db',
+                            help="Also save the word counts in this SQLite database (see Shared_Utils/parliament_db.py)")
+    args = arg_parser.parse_args()
+    if args.offline and args.no_cache:
+        arg_parser.error("--offline needs the cache, so it cannot be combined with --no-cache")
+    if args.resume and args.discard_checkpoint:
+        arg_parser.error("--resume carries on from the checkpoint, so it cannot be combined with --discard-checkpoint")
+    if args.resume and args.checkpoint_every <= 0 and not args.incremental:
+        arg_parser.error("--resume needs checkpoints, so it cannot be combined with --checkpoint-every 0")
+    return args
 
 def main():
-    parser = DebateParser()
+    args = parse_args()
+    cache = None if args.no_cache else XMLCache(args.cache_dir, offline=args.offline)
+    source = None
+    if args.source_dir:
+        source = DirectorySource(args.source_dir)
+    elif args.source_tar:
+        source = TarballSource(args.source_tar)
+    phrase_capacity = args.phrase_capacity if args.phrases else None
+    if phrase_capacity and args.incremental:
+        # Phrase summaries cannot have a changed file's phrases taken back out of them
+        print("Note: --phrases cannot be combined with --incremental, so phrases will not be counted")
+        phrase_capacity = None
+    parser = DebateParser(concurrency=args.concurrency, cache=cache, source=source,
+                          listing_ttl=args.listing_ttl, file_ttl=args.file_ttl, xml_backend=args.xml_backend,
+                          workers=args.workers, bucket_by=args.bucket_by, phrase_capacity=phrase_capacity,
+                          phrase_lengths=args.phrase_lengths, phrase_top=args.phrase_top, filter_words=args.filter,
+                          tag_cache_path=None if args.no_tag_cache else args.tag_cache,
+                          metrics=RunMetrics.from_env('parse_debates'))
     
-    # Hardcoded date range
-    start_date = "2024-07-17"
-    end_date = "2025-03-06"
+    start_date = args.start_date
+    end_date = args.end_date
     
     print(f"Analysing both main debates and Westminster Hall debates from {start_date} to {end_date}")
-    parser.analyse_date_range(start_date, end_date)
-    
-    if not parser.speakers:
-        print("\nNo speakers found. Please check:")
-        print("1. The date range is correct and not in the future")
-        print("2. The websites are accessible")
-        print("3. The XML files contain speech tags")
-        return
-    
-    output_file = "speaker_statistics.json"
-    parser.save_results(output_file)
+    output_file = args.output
+    manifest = None
+    checkpoint = None
+    # Only once the run has nothing left to resume is its checkpoint thrown away
+    finished = False
+    try:
+        if args.incremental:
+            if args.workers > 1:
+                print("Note: --incremental analyses files in this process, so --workers is ignored")
+            if args.resume:
+                print("Note: --incremental only analyses new files anyway, so --resume is ignored")
+            manifest = parser.analyse_date_range_incrementally(start_date, end_date, output_file)
+        else:
+            if args.checkpoint_every > 0:
+                checkpoint = RunCheckpoint(output_file, every=args.checkpoint_every)
+            try:
+                parser.analyse_date_range(start_date, end_date, checkpoint=checkpoint, resume=args.resume,
+                                          discard_checkpoint=args.discard_checkpoint)
+            except FileExistsError as e:
+                print(f"Error: {e}. Add --resume to carry on from it, or --discard-checkpoint to start again")
+                sys.exit(1)
+
+        if not parser.speakers:
+            print("\nNo speakers found. Please check:")
+            print("1. The date range is correct and not in the future")
+            print("2. The websites are accessible")
+            print("3. The XML files contain speech tags")
+            finished = True
+            return
+
+        with parser.metrics.stage('save'):
+            parser.save_results(output_file)
+            if args.filtered_output:
+                parser.save_filtered_results(args.filtered_output)
+                print(f"Statistics without the words the sanitiser removes saved to {args.filtered_output}")
+            if args.bucket_by:
+                parser.save_buckets(parser.bucket_store_path(output_file))
+                print(f"Time buckets saved to {parser.bucket_store_path(output_file)}")
+            if manifest:
+                manifest.save()
+        if args.db:
+            with parser.metrics.stage('save_db'):
+                parser.save_to_db(args.db, filtered_too=bool(args.filtered_output))
+            print(f"Word counts saved to {args.db}")
+        finished = True
+    finally:
+        if checkpoint and finished:
+            checkpoint.clear()
+        if parser.word_filter:
+            parser.word_filter.close()
     print(f"\nResults saved to {output_file}")
     
     # Print some basic statistics
@@ -150,5 +1094,9 @@ def main():
         print(f"\nSpeaker with most speeches: {most_speeches[0]}")
         print(f"Number of speeches: {most_speeches[1].total_speeches}")
 
+    parser.metrics.count('speakers', len(parser.speakers))
+    parser.metrics.record_http(parser.session)
+    parser.metrics.save()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
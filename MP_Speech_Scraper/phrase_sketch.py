@@ -0,0 +1,110 @@
+import re
+from collections import Counter
+from heapq import heapify, heappop, heappush
+from typing import Dict, Iterable, List, Tuple
+
+class SpaceSaving:
+    """Space-Saving heavy hitters summary that tracks at most `capacity` items.
+
+    Every tracked item's count overestimates its true count by at most its `error`, and
+    any item whose true count is above total/capacity is guaranteed to be tracked. Memory
+    is bounded by `capacity` however many distinct items are added.
+    """
+    __slots__ = ('capacity', 'counts', 'errors', 'heap')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        # (count, item) entries, which may be stale; _pop_min() skips or refreshes those
+        self.heap: List[Tuple[int, str]] = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _pop_min(self) -> Tuple[int, str]:
+        """Remove and return the tracked item with the smallest count."""
+        counts = self.counts
+        while True:
+            count, item = heappop(self.heap)
+            current = counts.get(item)
+            if current == count:
+                return count, item
+            if current is not None:
+                heappush(self.heap, (current, item))
+
+    def add(self, item: str, count: int = 1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            heappush(self.heap, (count, item))
+        else:
+            # Replace the smallest item, which may have been this one all along
+            min_count, min_item = self._pop_min()
+            del counts[min_item]
+            del self.errors[min_item]
+            counts[item] = min_count + count
+            self.errors[item] = min_count
+            heappush(self.heap, (min_count + count, item))
+
+    def update(self, items: Dict[str, int]):
+        for item, count in items.items():
+            self.add(item, count)
+
+    def _floor(self) -> int:
+        """The most an untracked item could have been seen, i.e. the smallest count once full."""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other: 'SpaceSaving'):
+        """Fold another summary into this one, keeping the combined error bounds."""
+        self_floor, other_floor = self._floor(), other._floor()
+        combined = []
+        for item in sorted(set(self.counts) | set(other.counts)):
+            count = self.counts.get(item, self_floor) + other.counts.get(item, other_floor)
+            error = self.errors.get(item, self_floor) + other.errors.get(item, other_floor)
+            combined.append((-count, error, item))
+        combined.sort()
+        combined = combined[:self.capacity]
+
+        self.counts = {item: -count for count, _, item in combined}
+        self.errors = {item: error for _, error, item in combined}
+        self.heap = [(-count, item) for count, _, item in combined]
+        heapify(self.heap)
+
+    def copy(self) -> 'SpaceSaving':
+        summary = SpaceSaving(self.capacity)
+        summary.counts = dict(self.counts)
+        summary.errors = dict(self.errors)
+        summary.heap = list(self.heap)
+        return summary
+
+    def to_dict(self) -> Dict:
+        return {'capacity': self.capacity, 'counts': self.counts, 'errors': self.errors}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SpaceSaving':
+        summary = cls(data['capacity'])
+        summary.counts = dict(data['counts'])
+        summary.errors = dict(data['errors'])
+        summary.heap = [(count, item) for item, count in summary.counts.items()]
+        heapify(summary.heap)
+        return summary
+
+    def top(self, k: int) -> List[Dict]:
+        """Return the k most frequent items as {'phrase', 'count', 'error'} dicts.
+
+        The true count of each phrase lies between count - error and count.
+        """
+        ranked = sorted(self.counts.items(), key=lambda entry: (-entry[1], self.errors[entry[0]], entry[0]))
+        return [{'phrase': item, 'count': count, 'error': self.errors[item]} for item, count in ranked[:k]]
+
+def count_phrases(text: str, lengths: Iterable[int] = (2, 3)) -> Counter:
+    """Count the n-word phrases of a lowercased speech, e.g. 'cost of living' for n = 3."""
+    tokens = re.findall(r'\b\w+\b', text)
+    phrases = Counter()
+    for n in lengths:
+        phrases.update(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return phrases
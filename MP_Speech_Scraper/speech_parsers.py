@@ -0,0 +1,49 @@
+from io import BytesIO
+from typing import BinaryIO, Callable, Dict, Iterator, List, Tuple
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# (speakername, person_id, text) for a single <speech> tag
+Speech = Tuple[str, str, str]
+
+def iter_speeches_lxml(source: BinaryIO) -> Iterator[Speech]:
+    """Stream the speeches out of a debate file with lxml's iterparse.
+
+    Each <speech> element is cleared once it has been read and earlier siblings are
+    removed from the tree, so memory use stays flat however large the file is.
+    """
+    for _, speech in etree.iterparse(source, events=('end',), tag='speech', recover=True, huge_tree=True):
+        text = ' '.join(s.strip() for s in speech.itertext() if s.strip())
+        yield speech.get('speakername', 'Unknown'), speech.get('person_id', 'Unknown'), text
+
+        speech.clear()
+        while speech.getprevious() is not None:
+            del speech.getparent()[0]
+
+def iter_speeches_bs4(source: BinaryIO) -> Iterator[Speech]:
+    """Read the speeches out of a debate file by loading the whole file into BeautifulSoup."""
+    # BeautifulSoup's XML mode needs lxml too, so use its built-in parser without it
+    soup = BeautifulSoup(source.read(), 'xml' if etree is not None else 'html.parser')
+    for speech in soup.find_all('speech'):
+        yield speech.get('speakername', 'Unknown'), speech.get('person_id', 'Unknown'), ' '.join(speech.stripped_strings)
+
+PARSER_BACKENDS: Dict[str, Callable[[BinaryIO], Iterator[Speech]]] = {
+    'lxml': iter_speeches_lxml,
+    'bs4': iter_speeches_bs4
+}
+
+# Fall back to BeautifulSoup if lxml is not installed
+DEFAULT_BACKEND = 'lxml' if etree is not None else 'bs4'
+
+def compare_backends(content: bytes) -> List[Tuple[int, Speech, Speech]]:
+    """Parse a debate file with both backends and return every (index, lxml, bs4) speech that differs."""
+    lxml_speeches = list(iter_speeches_lxml(BytesIO(content)))
+    bs4_speeches = list(iter_speeches_bs4(BytesIO(content)))
+    mismatches = [(i, a, b) for i, (a, b) in enumerate(zip(lxml_speeches, bs4_speeches)) if a != b]
+    if len(lxml_speeches) != len(bs4_speeches):
+        mismatches.append((min(len(lxml_speeches), len(bs4_speeches)), None, None))
+    return mismatches
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# How a sitting date (YYYY-MM-DD) is turned into a bucket key
+BUCKET_KEY_LENGTHS = {'day': 10, 'month': 7}
+
+def bucket_key(date: str, bucket_by: str) -> str:
+    """Return the bucket a sitting date falls into, e.g. '2025-01' for monthly buckets."""
+    return date[:BUCKET_KEY_LENGTHS[bucket_by]]
+
+def _write_array(path: str, values: array):
+    with open(path, 'wb') as f:
+        values.tofile(f)
+
+def write_bucket_store(store_dir: str, bucket_by: str, words: List[str], speakers: List[Tuple[str, str]],
+                       buckets: Dict[str, List[Tuple[int, int, array, array]]]):
+    """Write time-bucketed word counts to a columnar store directory.
+
+    Every bucket is stored as flat uint32 columns: `<key>.offsets` (where each speaker's
+    rows start, indexed by position in speakers.json), `<key>.words` / `<key>.counts`
+    (the rows themselves, sorted by speaker then word id) and `<key>.speeches` (each speaker's
+    number of speeches in the bucket). `buckets` maps each bucket key to (speaker index,
+    speeches, word ids, counts) entries, and word ids index into `words`.
+    The whole directory is replaced at once, so readers never see a half-written store.
+    """
+    tmp_dir = f"{store_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    with open(os.path.join(tmp_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.writelines(f"{word}\n" for word in words)
+    with open(os.path.join(tmp_dir, 'speakers.json'), 'w', encoding='utf-8') as f:
+        json.dump(speakers, f, ensure_ascii=False)
+
+    bucket_meta = []
+    for key in sorted(buckets):
+        offsets = array('I', [0] * (len(speakers) + 1))
+        speech_column = array('I', [0] * len(speakers))
+        word_column = array('I')
+        count_column = array('I')
+        entries = sorted(buckets[key], key=lambda entry: entry[0])
+        next_speaker = 0
+        for speaker_index, speeches, word_ids, counts in entries:
+            for i in range(next_speaker, speaker_index + 1):
+                offsets[i] = len(word_column)
+            speech_column[speaker_index] = speeches
+            word_column.extend(word_ids)
+            count_column.extend(counts)
+            next_speaker = speaker_index + 1
+        for i in range(next_speaker, len(speakers) + 1):
+            offsets[i] = len(word_column)
+
+        _write_array(os.path.join(tmp_dir, f"{key}.offsets"), offsets)
+        _write_array(os.path.join(tmp_dir, f"{key}.words"), word_column)
+        _write_array(os.path.join(tmp_dir, f"{key}.counts"), count_column)
+        _write_array(os.path.join(tmp_dir, f"{key}.speeches"), speech_column)
+        bucket_meta.append({'key': key, 'rows': len(word_column)})
+
+    with open(os.path.join(tmp_dir, 'buckets.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'bucket_by': bucket_by,
+            'byteorder': sys.byteorder,
+            'buckets': bucket_meta
+        }, f, indent=2)
+
+    old_dir = f"{store_dir}.old"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+class BucketStore:
+    """Read-only view of a store written by write_bucket_store, summing counts over date ranges."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'buckets.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(store_dir, 'speakers.json'), 'r', encoding='utf-8') as f:
+            self.speakers: List[Tuple[str, str]] = [tuple(speaker) for speaker in json.load(f)]
+        self.bucket_by = meta['bucket_by']
+        self.byteswap = meta['byteorder'] != sys.byteorder
+        self.keys = [bucket['key'] for bucket in meta['buckets']]
+        self.rows = {bucket['key']: bucket['rows'] for bucket in meta['buckets']}
+        self._words: Optional[List[str]] = None
+
+    @property
+    def words(self) -> List[str]:
+        if self._words is None:
+            with open(os.path.join(self.store_dir, 'vocab.txt'), 'r', encoding='utf-8') as f:
+                self._words = f.read().split('\n')[:-1]
+        return self._words
+
+    def _read(self, key: str, column: str, start: int = 0, count: Optional[int] = None) -> array:
+        values = array('I')
+        with open(os.path.join(self.store_dir, f"{key}.{column}"), 'rb') as f:
+            f.seek(start * values.itemsize)
+            if count is None:
+                values.frombytes(f.read())
+            else:
+                values.fromfile(f, count)
+        if self.byteswap:
+            values.byteswap()
+        return values
+
+    def keys_between(self, start_date: str, end_date: str) -> List[str]:
+        """Return the buckets overlapping start_date..end_date (whole months for monthly stores)."""
+        lo = bisect_left(self.keys, bucket_key(start_date, self.bucket_by))
+        hi = bisect_right(self.keys, bucket_key(end_date, self.bucket_by))
+        return self.keys[lo:hi]
+
+    def find_speaker(self, name_or_id: str) -> Optional[int]:
+        """Find a speaker by name (case-insensitive) or person_id."""
+        wanted = name_or_id.lower()
+        for index, (name, person_id) in enumerate(self.speakers):
+            if name.lower() == wanted or person_id == name_or_id:
+                return index
+        return None
+
+    def speech_counts(self, key: str) -> array:
+        """Each speaker's number of speeches in a bucket, indexed like speakers.json."""
+        if not os.path.exists(os.path.join(self.store_dir, f"{key}.speeches")):
+            # Stores written before speeches were saved only have the word counts
+            return array('I', [0] * len(self.speakers))
+        return self._read(key, 'speeches')
+
+    def iter_bucket(self, key: str):
+        """Yield (speaker index, word ids, counts) for every speaker with counts in a bucket."""
+        offsets = self._read(key, 'offsets')
+        word_column = self._read(key, 'words')
+        count_column = self._read(key, 'counts')
+        for speaker_index in range(len(self.speakers)):
+            start, end = offsets[speaker_index], offsets[speaker_index + 1]
+            if start < end:
+                yield speaker_index, word_column[start:end], count_column[start:end]
+
+    def word_counts(self, start_date: str, end_date: str, speaker: Optional[int] = None) -> Counter:
+        """Sum word counts over a date range, for one speaker or for everyone. Returns {word_id: count}."""
+        totals = Counter()
+        for key in self.keys_between(start_date, end_date):
+            if speaker is None:
+                word_column = self._read(key, 'words')
+                count_column = self._read(key, 'counts')
+            else:
+                start, end = self._read(key, 'offsets', speaker, 2)
+                if start == end:
+                    continue
+                word_column = self._read(key, 'words', start, end - start)
+                count_column = self._read(key, 'counts', start, end - start)
+            for word_id, count in zip(word_column, count_column):
+                totals[word_id] += count
+        return totals
+
+    def speaker_counts(self, word: str, start_date: str, end_date: str) -> Counter:
+        """Sum how often each speaker used one word over a date range. Returns {speaker index: count}."""
+        try:
+            word_id = self.words.index(word)
+        except ValueError:
+            return Counter()
+        totals = Counter()
+        for key in self.keys_between(start_date, end_date):
+            for speaker_index, word_ids, counts in self.iter_bucket(key):
+                i = bisect_left(word_ids, word_id)
+                if i < len(word_ids) and word_ids[i] == word_id:
+                    totals[speaker_index] += counts[i]
+        return totals
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Sum time-bucketed word counts written by parse_debates.py --bucket-by.")
+    arg_parser.add_argument('store', nargs='?', default="speaker_statistics.buckets", help="Bucket store directory")
+    arg_parser.add_argument('--from', dest='start_date', default="0000-01-01", help="First date to include (YYYY-MM-DD)")
+    arg_parser.add_argument('--to', dest='end_date', default="9999-12-31", help="Last date to include (YYYY-MM-DD)")
+    arg_parser.add_argument('--speaker', help="Only count this speaker (name or person_id)")
+    arg_parser.add_argument('--word', help="Show which speakers used this word instead of a speaker's top words")
+    arg_parser.add_argument('--top', type=int, default=20, help="Number of rows to show")
+    args = arg_parser.parse_args()
+
+    store = BucketStore(args.store)
+    print(f"Buckets: {', '.join(store.keys_between(args.start_date, args.end_date)) or 'none'}")
+
+    if args.word:
+        totals = store.speaker_counts(args.word.lower(), args.start_date, args.end_date)
+        for speaker_index, count in totals.most_common(args.top):
+            print(f"{store.speakers[speaker_index][0]}: {count}")
+        return
+
+    speaker = None
+    if args.speaker:
+        speaker = store.find_speaker(args.speaker)
+        if speaker is None:
+            print(f"Error: No data found for speaker: {args.speaker}")
+            sys.exit(1)
+
+    totals = store.word_counts(args.start_date, args.end_date, speaker)
+    words = store.words
+    for word_id, count in totals.most_common(args.top):
+        print(f"{words[word_id]}: {count}")
+
+if __name__ == "__main__":
+    main()
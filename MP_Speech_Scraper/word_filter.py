@@ -0,0 +1,33 @@
+import os
+import sys
+from typing import Optional
+
+# The sanitiser's rules (procedural words, words never removed, stop words and parts of
+# speech) are reused as they are, so filtered counts match running sanitise_json.py afterwards
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'JSON_Sanitiser'))
+import sanitise_json
+
+class WordFilter:
+    """The sanitiser's keep/drop decision for every word id of a Vocabulary, made once per word.
+
+    Decisions are kept in a bytearray indexed by word id, so filtering counts is a lookup per
+    word. Words added to the vocabulary since the last update() are decided together, using
+    spaCy's analyses from the sanitiser's tag cache and tagging only words it does not hold, so
+    update() is called once per debate file rather than per speech.
+    """
+
+    def __init__(self, vocab, tag_cache_path: Optional[str] = sanitise_json.TAG_CACHE_FILE):
+        self.vocab = vocab
+        self.mask = bytearray()
+        if tag_cache_path:
+            loaded = sanitise_json.open_tag_cache(tag_cache_path)
+            print(f"Loaded {loaded} saved word analyses from {tag_cache_path}")
+
+    def update(self) -> bytearray:
+        """Decide any words new to the vocabulary and return the decision for every word id."""
+        if len(self.mask) < len(self.vocab.words):
+            self.mask.extend(sanitise_json.keep_mask(self.vocab.words[len(self.mask):]))
+        return self.mask
+
+    def close(self):
+        sanitise_json.close_tag_cache()
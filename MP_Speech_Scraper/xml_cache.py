@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+class CacheMissError(Exception):
+    """Raised in offline mode when a URL has never been downloaded."""
+
+class XMLCache:
+    """On-disk cache of TheyWorkForYou files, stored gzipped alongside their ETag/Last-Modified headers.
+
+    Cached entries younger than `max_age` are served straight from disk. Older entries are
+    revalidated with If-None-Match/If-Modified-Since, so an unchanged file costs a 304
+    instead of a full download. In offline mode only the cache is used.
+    """
+
+    def __init__(self, cache_dir: str = 'twfy_cache', offline: bool = False):
+        self.cache_dir = cache_dir
+        self.offline = offline
+
+    def _cache_paths(self, url: str):
+        """Return the (body, metadata) paths used to cache a URL."""
+        parsed = urlparse(url)
+        path = parsed.path.lstrip('/')
+        if not path or path.endswith('/'):
+            path += 'index.html'
+        base = os.path.join(self.cache_dir, parsed.netloc.replace(':', '_'), *path.split('/'))
+        return f"{base}.gz", f"{base}.meta.json"
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """Write a file via a temporary file so readers never see a partial entry."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _load(self, url: str):
+        """Return the cached (body, metadata) for a URL, or (None, None) if it is not cached."""
+        body_path, meta_path = self._cache_paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with gzip.open(body_path, 'rb') as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, url: str, content: bytes, meta: Dict):
+        body_path, meta_path = self._cache_paths(url)
+        self._write_atomic(body_path, gzip.compress(content))
+        self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def get(self, session: requests.Session, url: str, max_age: Optional[float] = None) -> bytes:
+        """Return the body of a URL, downloading or revalidating it only when needed.
+
+        `session` is a requests.Session or anything with the same get(), such as HTTPClient.
+        """
+        content, meta = self._load(url)
+
+        if content is not None:
+            if self.offline:
+                return content
+            if max_age is not None and time.time() - meta['fetched_at'] < max_age:
+                return content
+        elif self.offline:
+            raise CacheMissError(f"{url} is not in the cache at {self.cache_dir}")
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = session.get(url, headers=headers)
+
+        if response.status_code == 304 and content is not None:
+            # Unchanged upstream, so only the metadata needs refreshing
+            meta['etag'] = response.headers.get('ETag', meta.get('etag'))
+            meta['fetched_at'] = time.time()
+            _, meta_path = self._cache_paths(url)
+            self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+            return content
+
+        response.raise_for_status()
+        self._store(url, response.content, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        })
+        return response.content
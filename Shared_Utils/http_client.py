@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Responses that mean the server wants fewer requests
+THROTTLE_STATUSES = {429, 503}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Turn a Retry-After header (seconds or an HTTP date) into a number of seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every thread using a client, adapting its rate to the server.
+
+    Each throttling response halves the rate and, with a Retry-After, pauses every thread
+    until then. Each successful response adds `increase` requests per second back, up to
+    `max_rate`. A `rate` of None means no limit until the server first pushes back, after
+    which `throttled_rate` is used as the starting point.
+    """
+
+    def __init__(self, rate: Optional[float] = 10.0, max_rate: Optional[float] = None, min_rate: float = 0.5,
+                 increase: float = 0.5, throttled_rate: float = 10.0):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.throttled_rate = throttled_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        return
+                    # Allow bursts of up to one second's worth of requests
+                    self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Slow down after the server asked for fewer requests."""
+        with self.lock:
+            current = self.rate if self.rate is not None else self.throttled_rate * 2
+            self.rate = max(self.min_rate, current / 2)
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        """Speed back up a little after a successful response."""
+        with self.lock:
+            if self.rate is not None:
+                self.rate += self.increase
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+class HTTPClient:
+    """One pooled HTTP client for all the scrapers.
+
+    Wraps a requests.Session, so connections are kept alive and reused across requests and
+    threads, and asks for gzipped responses. Every request goes through an
+    AdaptiveRateLimiter. Connection errors, timeouts and RETRY_STATUSES responses are retried
+    with full-jitter exponential backoff, honouring any Retry-After header. Scripts share one
+    module-level client, paced by the API's own rate limiting rather than fixed sleeps.
+    """
+
+    def __init__(self, rate: Optional[float] = 10.0, max_rate: Optional[float] = 50.0, pool_size: int = 10,
+                 retries: int = 5, backoff: float = 0.5, max_backoff: float = 60.0, timeout: float = 30.0):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.limiter = AdaptiveRateLimiter(rate, max_rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # Running totals, e.g. for reporting how much a run downloaded
+        self.stats: Dict[str, int] = {'requests': 0, 'retries': 0, 'throttled': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying transient failures. The final response is returned whatever its status."""
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                self._count('retries')
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            self._count('requests')
+            self._count('bytes', len(response.content))
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                self._count('retries')
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                throttled = response.status_code in THROTTLE_STATUSES
+                if throttled:
+                    self._count('throttled')
+                    self.limiter.throttle(retry_after)
+                if not (throttled and retry_after):
+                    # Unless the limiter was paused, wait here, capped like the backoff so that
+                    # one bad Retry-After header cannot stall this thread for hours
+                    time.sleep(min(retry_after, self.max_backoff) if retry_after else self._backoff_delay(attempt))
+                continue
+
+            if response.status_code < 400:
+                self.limiter.succeeded()
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def get_json(self, url: str, params: Optional[Dict] = None):
+        """GET a URL and return its decoded JSON body, raising for error statuses."""
+        response = self.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
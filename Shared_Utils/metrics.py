@@ -0,0 +1,220 @@
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+# Environment variables that turn reporting and profiling on for any of the tools
+METRICS_DIR_VARIABLE = 'PIPELINE_METRICS_DIR'
+PROFILE_VARIABLE = 'PIPELINE_PROFILE'
+TRACE_MEMORY_VARIABLE = 'PIPELINE_TRACE_MEMORY'
+
+# Prefix of every metric in the Prometheus textfile
+PROMETHEUS_PREFIX = 'parliament_pipeline'
+
+def _stage_set(value: Optional[str]) -> set:
+    """Parse a comma separated list of stage names, where 'all' means every stage."""
+    return {stage.strip() for stage in (value or '').split(',') if stage.strip()}
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class RunMetrics:
+    """Timers, counters and cache statistics for one run of a tool, saved as a JSON report and a Prometheus textfile.
+
+    Time spent in each named stage is added up over every time the stage is entered, so a
+    stage run from several threads at once (like downloads) can add up to more than the
+    run's wall time. Stages listed in `profile_stages` are run under cProfile, and those in
+    `trace_stages` under tracemalloc, which records their peak memory and largest allocations.
+    Scripts keep one module-level instance for their stage timers and request counts.
+    """
+
+    def __init__(self, run: str, output_dir: Optional[str] = None, profile_stages: Iterable[str] = (),
+                 trace_stages: Iterable[str] = ()):
+        self.run = run
+        self.output_dir = output_dir
+        self.profile_stages = set(profile_stages)
+        self.trace_stages = set(trace_stages)
+        self.started = time.time()
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, float] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        # Rates worked out when the report is made: name -> (counter, stage)
+        self.rates: Dict[str, tuple] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, run: str) -> 'RunMetrics':
+        """Create metrics configured by PIPELINE_METRICS_DIR, PIPELINE_PROFILE and PIPELINE_TRACE_MEMORY."""
+        return cls(run, os.environ.get(METRICS_DIR_VARIABLE), _stage_set(os.environ.get(PROFILE_VARIABLE)),
+                   _stage_set(os.environ.get(TRACE_MEMORY_VARIABLE)))
+
+    @property
+    def enabled(self) -> bool:
+        """Whether anything will be saved at the end of the run."""
+        return bool(self.output_dir or self.profile_stages or self.trace_stages)
+
+    def _wanted(self, stages: set, stage: str) -> bool:
+        return stage in stages or 'all' in stages
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the code inside the with block as the stage `name`."""
+        profile = self._start_profile(name) if self._wanted(self.profile_stages, name) else None
+        started_tracing = self._start_trace() if self._wanted(self.trace_stages, name) else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile:
+                profile.disable()
+            with self._lock:
+                stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+                stage['seconds'] += elapsed
+                stage['calls'] += 1
+            if started_tracing is not None:
+                self._finish_trace(name, started_tracing)
+
+    def _start_profile(self, name: str) -> Optional[cProfile.Profile]:
+        with self._lock:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Another thread is already profiling (only one profiler can run at a time)
+            return None
+        return profile
+
+    def _start_trace(self) -> bool:
+        """Start tracemalloc if it is not already running, returning whether this stage started it."""
+        if tracemalloc.is_tracing():
+            return False
+        tracemalloc.start()
+        return True
+
+    def _finish_trace(self, name: str, started: bool):
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+        if started:
+            tracemalloc.stop()
+        with self._lock:
+            stage = self.stages[name]
+            stage['peak_memory_mb'] = round(max(stage.get('peak_memory_mb', 0.0), peak / (1024 * 1024)), 2)
+            stage['top_allocations'] = [{'line': str(stat.traceback), 'kb': round(stat.size / 1024, 1), 'count': stat.count}
+                                        for stat in top]
+
+    def count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_rate(self, name: str, counter: str, stage: str):
+        """Report `counter` per second of time spent in `stage`, e.g. speeches per second of analysis."""
+        self.rates[name] = (counter, stage)
+
+    def record_cache(self, name: str, hits: int, misses: int):
+        self.caches[name] = {'hits': hits, 'misses': misses}
+
+    def record_http(self, client):
+        """Copy an HTTPClient's running totals of requests, retries, throttled responses and bytes."""
+        for stat, value in client.stats.items():
+            self.counters[f"http_{stat}"] = value
+
+    def report(self) -> Dict:
+        finished = time.time()
+        rates = {}
+        for name, (counter, stage) in self.rates.items():
+            seconds = self.stages.get(stage, {}).get('seconds')
+            if seconds and counter in self.counters:
+                rates[name] = round(self.counters[counter] / seconds, 2)
+        caches = {}
+        for name, cache in self.caches.items():
+            lookups = cache['hits'] + cache['misses']
+            caches[name] = {**cache, 'hit_rate': round(cache['hits'] / lookups, 4) if lookups else None}
+        return {
+            'run': self.run,
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'finished': datetime.fromtimestamp(finished).isoformat(timespec='seconds'),
+            'duration_seconds': round(finished - self.started, 3),
+            'stages': {name: {**stage, 'seconds': round(stage['seconds'], 4)} for name, stage in self.stages.items()},
+            'counters': dict(self.counters),
+            'rates': rates,
+            'caches': caches
+        }
+
+    def prometheus_text(self, report: Dict) -> str:
+        """Render a report in the Prometheus text exposition format, for node_exporter's textfile collector."""
+        run = f'run="{_label(self.run)}"'
+        lines = []
+
+        def gauge(name: str, help_text: str, samples: Iterable[tuple]):
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for labels, value in samples:
+                lines.append(f"{metric}{{{','.join([run] + labels)}}} {value}")
+
+        gauge('run_duration_seconds', "Wall time of the last run", [([], report['duration_seconds'])])
+        gauge('run_finished_timestamp_seconds', "When the last run finished", [([], round(time.time(), 3))])
+        gauge('stage_seconds', "Seconds spent in each stage of the last run",
+              [([f'stage="{_label(name)}"'], stage['seconds']) for name, stage in report['stages'].items()])
+        gauge('stage_calls', "Times each stage was entered in the last run",
+              [([f'stage="{_label(name)}"'], stage['calls']) for name, stage in report['stages'].items()])
+        traced = [(name, stage) for name, stage in report['stages'].items() if 'peak_memory_mb' in stage]
+        if traced:
+            gauge('stage_peak_memory_bytes', "Peak memory traced during each stage of the last run",
+                  [([f'stage="{_label(name)}"'], int(stage['peak_memory_mb'] * 1024 * 1024)) for name, stage in traced])
+        for name, value in report['counters'].items():
+            gauge(name, f"{name.replace('_', ' ').capitalize()} in the last run", [([], value)])
+        for name, value in report['rates'].items():
+            gauge(name, f"{name.replace('_', ' ').capitalize()} in the last run", [([], value)])
+        if report['caches']:
+            gauge('cache_hit_ratio', "Share of cache lookups that were hits in the last run",
+                  [([f'cache="{_label(name)}"'], cache['hit_rate']) for name, cache in report['caches'].items()
+                   if cache['hit_rate'] is not None])
+        return '\n'.join(lines) + '\n'
+
+    def save(self) -> Optional[Dict]:
+        """Write the JSON report, Prometheus textfile and any profiles, if metrics were turned on.
+
+        Files are named after the run, e.g. parse_debates.json, parse_debates.prom and
+        parse_debates.analyse.prof, in the metrics directory or else the working directory.
+        """
+        if not self.enabled:
+            return None
+        output_dir = self.output_dir or '.'
+        os.makedirs(output_dir, exist_ok=True)
+        report = self.report()
+
+        for name, profile in self._profiles.items():
+            path = os.path.join(output_dir, f"{self.run}.{_metric_name(name)}.prof")
+            profile.dump_stats(path)
+            if name in report['stages']:
+                report['stages'][name]['profile'] = path
+            print(f"Profile of stage '{name}' saved to {path}")
+
+        report_path = os.path.join(output_dir, f"{self.run}.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        # Written under a temporary name, as the textfile collector may read it at any moment
+        prom_path = os.path.join(output_dir, f"{self.run}.prom")
+        with open(f"{prom_path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text(report))
+        os.replace(f"{prom_path}.tmp", prom_path)
+        print(f"\nTime per stage:\n{self.summary()}")
+        print(f"Run metrics saved to {report_path} and {prom_path}")
+        return report
+
+    def summary(self) -> str:
+        """One line per stage, slowest first, for printing at the end of a run."""
+        stages = sorted(self.stages.items(), key=lambda item: -item[1]['seconds'])
+        return '\n'.join(f"  {name}: {stage['seconds']:.2f}s ({stage['calls']} calls)" for name, stage in stages)
@@ -0,0 +1,246 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from speaker_stats_io import SpeakerRecord
+
+# Names of the speaker statistics datasets: parse_debates.py's full counts, and the sanitiser's
+RAW_DATASET = 'raw'
+CLEANED_DATASET = 'cleaned'
+
+# Prefix of the TheyWorkForYou-style person_id built from a Members API id
+PERSON_ID_PREFIX = 'uk.org.publicwhip/person/'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    member_id INTEGER PRIMARY KEY,
+    person_id TEXT,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    party TEXT,
+    constituency TEXT,
+    portrait_url TEXT,
+    position INTEGER,
+    updated TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_by_name ON members (name_key);
+CREATE INDEX IF NOT EXISTS members_by_person ON members (person_id);
+
+CREATE TABLE IF NOT EXISTS handles (
+    member_id INTEGER NOT NULL,
+    platform TEXT NOT NULL,
+    handle TEXT,
+    updated TEXT NOT NULL,
+    PRIMARY KEY (member_id, platform)
+);
+
+CREATE TABLE IF NOT EXISTS id_mappings (
+    source_id TEXT PRIMARY KEY,
+    person_id TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS id_mappings_by_person ON id_mappings (person_id);
+
+CREATE TABLE IF NOT EXISTS speakers (
+    speaker_id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    person_id TEXT,
+    total_speeches INTEGER NOT NULL,
+    updated TEXT NOT NULL,
+    UNIQUE (dataset, name)
+);
+CREATE INDEX IF NOT EXISTS speakers_by_name ON speakers (dataset, name_key);
+CREATE INDEX IF NOT EXISTS speakers_by_person ON speakers (dataset, person_id);
+
+CREATE TABLE IF NOT EXISTS word_counts (
+    speaker_id INTEGER NOT NULL REFERENCES speakers (speaker_id) ON DELETE CASCADE,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    UNIQUE (speaker_id, word)
+);
+"""
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+class ParliamentDB:
+    """SQLite database holding every tool's data, so lookups and joins are indexed queries.
+
+    - members: MPs from the Members API, keyed by their API id
+    - handles: each MP's social media handles, by platform
+    - id_mappings: person_ids standardise_ids.py matched to TheyWorkForYou's
+    - speakers and word_counts: speaker statistics, in named datasets ('raw' and 'cleaned')
+
+    Every write is an upsert, so re-running a tool updates its rows in place rather than
+    rewriting a whole file. Speakers' words are read back in the order they were first written,
+    and MPs in the order the Members API last listed them, as in mps_data.json.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        if 'position' not in {row[1] for row in self.connection.execute("PRAGMA table_info(members)")}:
+            # Databases made before MPs kept the order they were listed in
+            self.connection.execute("ALTER TABLE members ADD COLUMN position INTEGER")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> 'ParliamentDB':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Writers
+
+    def upsert_members(self, members: Iterable[Dict]) -> int:
+        """Add or update MPs given in mps_data layout plus their Members API 'member_id', in the API's order."""
+        updated = _now()
+        rows = [(member['member_id'], member.get('person_id'), member['name'], member['name'].casefold(),
+                 member.get('party_affiliation'), member.get('constituency'), member.get('portrait_URL'), position, updated)
+                for position, member in enumerate(members)]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO members (member_id, person_id, name, name_key, party, constituency, portrait_url, position, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (member_id) DO UPDATE SET"
+                " person_id = COALESCE(excluded.person_id, person_id), name = excluded.name, name_key = excluded.name_key,"
+                " party = COALESCE(excluded.party, party), constituency = COALESCE(excluded.constituency, constituency),"
+                " portrait_url = COALESCE(excluded.portrait_url, portrait_url), position = excluded.position,"
+                " updated = excluded.updated",
+                rows
+            )
+        return len(rows)
+
+    def upsert_handles(self, handles: Iterable[Tuple[int, Optional[str]]], platform: str = 'twitter') -> int:
+        """Add or update (member_id, handle) pairs, where a handle of None records that the MP has none."""
+        updated = _now()
+        rows = [(member_id, platform, handle, updated) for member_id, handle in handles]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO handles (member_id, platform, handle, updated) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (member_id, platform) DO UPDATE SET handle = excluded.handle, updated = excluded.updated",
+                rows
+            )
+        return len(rows)
+
+    def upsert_id_mappings(self, id_mapping: Dict[str, str]) -> int:
+        """Record the standardised person_id for each old one."""
+        updated = _now()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO id_mappings (source_id, person_id, updated) VALUES (?, ?, ?)"
+                " ON CONFLICT (source_id) DO UPDATE SET person_id = excluded.person_id, updated = excluded.updated",
+                [(source_id, person_id, updated) for source_id, person_id in id_mapping.items()]
+            )
+        return len(id_mapping)
+
+    def write_speaker_records(self, dataset: str, records: Iterable[SpeakerRecord], replace: bool = True) -> int:
+        """Upsert (speaker, data) records into a dataset one speaker at a time, in a single transaction.
+
+        Each speaker's word counts are upserted, so only counts that changed are rewritten, new
+        words are added after the existing ones and words no longer used are deleted. With
+        replace, speakers missing from records are removed from the dataset, so it ends up
+        holding exactly the records. Returns the number of speakers written.
+        """
+        updated = _now()
+        seen = set()
+        with self.connection:
+            for speaker, speaker_data in records:
+                self.connection.execute(
+                    "INSERT INTO speakers (dataset, name, name_key, person_id, total_speeches, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (dataset, name) DO UPDATE SET person_id = excluded.person_id,"
+                    " total_speeches = excluded.total_speeches, updated = excluded.updated",
+                    (dataset, speaker, speaker.casefold(), speaker_data.get('person_id'),
+                     speaker_data.get('total_speeches', 0), updated)
+                )
+                speaker_id = self.connection.execute(
+                    "SELECT speaker_id FROM speakers WHERE dataset = ? AND name = ?", (dataset, speaker)
+                ).fetchone()[0]
+                word_counts = speaker_data.get('word_counts', {})
+                self.connection.executemany(
+                    "INSERT INTO word_counts (speaker_id, word, count) VALUES (?, ?, ?)"
+                    " ON CONFLICT (speaker_id, word) DO UPDATE SET count = excluded.count"
+                    " WHERE word_counts.count != excluded.count",
+                    ((speaker_id, word, count) for word, count in word_counts.items())
+                )
+                gone = [(speaker_id, word) for (word,) in self.connection.execute(
+                    "SELECT word FROM word_counts WHERE speaker_id = ?", (speaker_id,)) if word not in word_counts]
+                self.connection.executemany("DELETE FROM word_counts WHERE speaker_id = ? AND word = ?", gone)
+                seen.add(speaker_id)
+            if replace:
+                stale = [(speaker_id,) for (speaker_id,) in self.connection.execute(
+                    "SELECT speaker_id FROM speakers WHERE dataset = ?", (dataset,)) if speaker_id not in seen]
+                self.connection.executemany("DELETE FROM speakers WHERE speaker_id = ?", stale)
+        return len(seen)
+
+    # Readers
+
+    def members(self, standardised: bool = True, platform: Optional[str] = None) -> List[Dict]:
+        """Every MP in mps_data layout and order, with the person_id standardise_ids.py matched if standardised.
+
+        With platform, each MP also gets their handle on it (or None) as '<platform>_handle'.
+        """
+        person_id = "COALESCE(id_mappings.person_id, members.person_id)" if standardised else "members.person_id"
+        rows = self.connection.execute(
+            f"SELECT members.name, {person_id}, party, constituency, portrait_url, handles.handle FROM members"
+            " LEFT JOIN id_mappings ON id_mappings.source_id = members.person_id"
+            " LEFT JOIN handles ON handles.member_id = members.member_id AND handles.platform = ?"
+            " ORDER BY members.position, members.member_id", (platform,))
+        members = []
+        for name, person_id, party, constituency, portrait_url, handle in rows:
+            member = {'name': name, 'person_id': person_id, 'party_affiliation': party,
+                      'constituency': constituency, 'portrait_URL': portrait_url}
+            if platform:
+                member[f'{platform}_handle'] = handle
+            members.append(member)
+        return members
+
+    def speaker_ids(self, dataset: str = RAW_DATASET) -> Dict[str, Dict]:
+        """Every speaker's person_id, in the {speaker: {'person_id': ...}} layout standardise_ids.py matches against."""
+        rows = self.connection.execute(
+            "SELECT name, person_id FROM speakers WHERE dataset = ? ORDER BY speaker_id", (dataset,))
+        return {name: {'person_id': person_id} for name, person_id in rows}
+
+    def find_speaker(self, dataset: str, query: str) -> Optional[Tuple[int, str]]:
+        """Find a speaker by name in any case, person_id or the number at the end of it, returning (speaker_id, name)."""
+        for column, value in (('name_key', query.casefold()), ('person_id', query),
+                              ('person_id', f"{PERSON_ID_PREFIX}{query}")):
+            row = self.connection.execute(
+                f"SELECT speaker_id, name FROM speakers WHERE dataset = ? AND {column} = ? ORDER BY speaker_id LIMIT 1",
+                (dataset, value)).fetchone()
+            if row:
+                return row
+        return None
+
+    def speaker_data(self, speaker_id: int, top: Optional[int] = None) -> Dict:
+        """A speaker's statistics in speaker_statistics.json layout, or with only their top most used words."""
+        person_id, total_speeches = self.connection.execute(
+            "SELECT person_id, total_speeches FROM speakers WHERE speaker_id = ?", (speaker_id,)).fetchone()
+        if top:
+            rows = self.connection.execute(
+                "SELECT word, count FROM word_counts WHERE speaker_id = ? ORDER BY count DESC, rowid LIMIT ?",
+                (speaker_id, top))
+        else:
+            rows = self.connection.execute(
+                "SELECT word, count FROM word_counts WHERE speaker_id = ? ORDER BY rowid", (speaker_id,))
+        return {'person_id': person_id, 'total_speeches': total_speeches, 'word_counts': dict(rows)}
+
+    def iter_speaker_records(self, dataset: str, top: Optional[int] = None) -> Iterator[SpeakerRecord]:
+        """Yield (speaker, data) for every speaker in a dataset, one at a time, in the order they were first written."""
+        speakers = self.connection.execute(
+            "SELECT speaker_id, name FROM speakers WHERE dataset = ? ORDER BY speaker_id", (dataset,)).fetchall()
+        for speaker_id, name in speakers:
+            yield name, self.speaker_data(speaker_id, top)
@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# (speaker name, {'person_id', 'total_speeches', 'word_counts', ...}) for a single speaker
+SpeakerRecord = Tuple[str, Dict]
+
+# File extensions of each speaker statistics format
+FORMAT_EXTENSIONS = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.msgpack': 'msgpack',
+    '.mpk': 'msgpack'
+}
+
+def detect_format(path: str) -> str:
+    """Work out a statistics file's format from its extension, defaulting to JSON."""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'json')
+
+def _require_msgpack():
+    if msgpack is None:
+        raise ImportError("The msgpack format needs the msgpack package (pip install msgpack)")
+
+def write_speaker_records(path: str, records: Iterable[SpeakerRecord], fmt: Optional[str] = None) -> int:
+    """Write speaker records one at a time, so the full statistics never have to be built in memory.
+
+    - json: the usual {speaker: {...}} object, byte for byte what json.dump(indent=2) writes
+    - ndjson: one {"speaker": ..., "person_id": ..., ...} object per line
+    - msgpack: a stream of the same objects as ndjson, packed back to back
+
+    The file is written under a temporary name and renamed into place once complete.
+    Returns the number of speakers written.
+    """
+    fmt = fmt or detect_format(path)
+    tmp_path = f"{path}.tmp"
+    written = 0
+
+    if fmt == 'msgpack':
+        _require_msgpack()
+        packer = msgpack.Packer()
+        with open(tmp_path, 'wb') as f:
+            for speaker, data in records:
+                f.write(packer.pack({'speaker': speaker, **data}))
+                written += 1
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if fmt == 'ndjson':
+                for speaker, data in records:
+                    f.write(json.dumps({'speaker': speaker, **data}, ensure_ascii=False))
+                    f.write('\n')
+                    written += 1
+            else:
+                f.write('{')
+                for speaker, data in records:
+                    f.write(',\n  ' if written else '\n  ')
+                    f.write(f"{json.dumps(speaker, ensure_ascii=False)}: ")
+                    f.write(json.dumps(data, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+                    written += 1
+                f.write('\n}' if written else '}')
+
+    os.replace(tmp_path, path)
+    return written
+
+def _split_record(record: Dict) -> SpeakerRecord:
+    speaker = record.pop('speaker')
+    return speaker, record
+
+def iter_speaker_records(path: str, fmt: Optional[str] = None) -> Iterator[SpeakerRecord]:
+    """Yield (speaker, data) for every speaker in a statistics file written in any format.
+
+    NDJSON and msgpack files are always read one speaker at a time. JSON files are streamed
+    with ijson when it is installed, and otherwise loaded in full.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == 'msgpack':
+        _require_msgpack()
+        with open(path, 'rb') as f:
+            for record in msgpack.Unpacker(f, raw=False):
+                yield _split_record(record)
+    elif fmt == 'ndjson':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield _split_record(json.loads(line))
+    elif ijson is not None:
+        with open(path, 'rb') as f:
+            yield from ijson.kvitems(f, '', use_float=True)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f).items()
+
+def is_streamed(path: str, fmt: Optional[str] = None) -> bool:
+    """Whether iter_speaker_records reads this file one speaker at a time rather than all at once."""
+    return (fmt or detect_format(path)) != 'json' or ijson is not None
+
+def load_speaker_statistics(path: str, fmt: Optional[str] = None) -> Dict:
+    """Read a whole statistics file in any format into the usual {speaker: {...}} dict."""
+    return dict(iter_speaker_records(path, fmt))